@@ -0,0 +1,59 @@
+import argparse
+import sys
+from benchmarks.results import load_report
+
+# Metric -> True when a larger value is worse.
+METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "throughput_per_s": False,
+    "error_rate": True
+}
+
+def compare(baseline: dict, current: dict, threshold: float, metrics=None) -> list:
+    regressions = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = baseline['results'][name], current['results'][name]
+        if "skipped" in before or "skipped" in after:
+            continue
+
+        for metric, larger_is_worse in (metrics or METRICS).items():
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+
+            if metric == "error_rate":
+                change = new - old
+                regressed = change > 0.01
+            else:
+                change = (new - old) / old if old else 0.0
+                regressed = change > threshold if larger_is_worse else change < -threshold
+
+            print(f"{'REGRESSION' if regressed else 'ok':10} {name:55} {metric:16} {old:12.3f} -> {new:12.3f} ({change:+.1%})")
+            if regressed:
+                regressions.append((name, metric, old, new))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown before failing")
+    parser.add_argument("--metrics", default=None, help="Comma-separated subset of metrics to check")
+    args = parser.parse_args()
+
+    baseline = load_report(args.baseline)
+    current = load_report(args.current)
+    if baseline['host'].get('cpus') != current['host'].get('cpus'):
+        print("Warning: results were produced on hosts with different CPU counts")
+
+    metrics = {metric: METRICS[metric] for metric in args.metrics.split(",")} if args.metrics else None
+    regressions = compare(baseline, current, args.threshold, metrics)
+
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
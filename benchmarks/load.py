@@ -0,0 +1,113 @@
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import httpx
+from benchmarks.results import summarize
+from models_spark.states import state_bbox
+
+def coordinate_pool(size: int, seed: int = 0) -> List[Tuple[float, float]]:
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = state_bbox()
+    return [(round(rng.uniform(min_lat, max_lat), 4), round(rng.uniform(min_lon, max_lon), 4)) for _ in range(size)]
+
+def endpoint_requests(coords: List[Tuple[float, float]]) -> Dict[str, Callable[[random.Random], dict]]:
+    def point(rng):
+        lat, lon = rng.choice(coords)
+        return {"lat": lat, "lon": lon}
+
+    return {
+        "/power": lambda rng: {"method": "POST", "url": "/power", "json": point(rng)},
+        "/air_quality": lambda rng: {"method": "POST", "url": "/air_quality", "json": point(rng)},
+        "/crops_info": lambda rng: {"method": "POST", "url": "/crops_info", "json": point(rng)},
+        "/dashboard": lambda rng: {"method": "POST", "url": "/dashboard", "json": point(rng)},
+        "/forecast": lambda rng: {"method": "POST", "url": "/forecast", "json": {**point(rng), "hours": 48}},
+        "/power/batch": lambda rng: {
+            "method": "POST",
+            "url": "/power/batch",
+            "json": {"locations": [point(rng) for _ in range(16)]}
+        },
+        "/grid/point": lambda rng: {"method": "GET", "url": "/grid/point", "params": point(rng)},
+        "/health": lambda rng: {"method": "GET", "url": "/health"}
+    }
+
+def classify(response: httpx.Response) -> Optional[str]:
+    if response.status_code >= 400:
+        return f"status {response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    # Most endpoints report failures as a 200 with an "error" key.
+    if isinstance(body, dict) and "error" in body:
+        return "error body"
+    return None
+
+async def drive_endpoint(
+    client: httpx.AsyncClient,
+    make_request: Callable[[random.Random], dict],
+    concurrency: int,
+    duration: float,
+    max_requests: int = None,
+    seed: int = 0
+) -> dict:
+    latencies = []
+    errors = {}
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int):
+        nonlocal issued
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            started = time.perf_counter()
+            try:
+                error = classify(await client.request(**make_request(rng)))
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    error_count = sum(errors.values())
+    return summarize(
+        latencies,
+        elapsed,
+        kind="load",
+        concurrency=concurrency,
+        errors=error_count,
+        error_rate=error_count / len(latencies) if latencies else 0.0,
+        error_kinds=errors
+    )
+
+async def run_load_async(
+    base_url: str,
+    endpoints: List[str],
+    concurrency: int,
+    duration: float,
+    coords: int,
+    max_requests: int = None
+) -> Dict[str, dict]:
+    requests = endpoint_requests(coordinate_pool(coords))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        for endpoint in endpoints:
+            result = await drive_endpoint(client, requests[endpoint], concurrency, duration, max_requests)
+            results[f"load.{endpoint}"] = result
+            print(
+                f"load.{endpoint}: {result['n']} req, p50 {result.get('p50_ms', 0):.1f} ms, "
+                f"p99 {result.get('p99_ms', 0):.1f} ms, {result.get('throughput_per_s') or 0:.1f} req/s, "
+                f"{result['errors']} errors"
+            )
+
+    return results
+
+def run_load(base_url: str, endpoints: List[str], concurrency: int = 32, duration: float = 20, coords: int = 200, max_requests: int = None) -> Dict[str, dict]:
+    return asyncio.run(run_load_async(base_url, endpoints, concurrency, duration, coords, max_requests))
@@ -0,0 +1,127 @@
+import os
+import random
+import time
+from typing import Callable, Dict, List
+from benchmarks.results import summarize
+from benchmarks.stubs import observation
+from models_spark.states import state_bbox
+
+def sample_weather(n: int, seed: int = 0) -> List[dict]:
+    from utils.owa import transform_weather_data
+
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = state_bbox()
+    now = int(time.time())
+    samples = []
+    for _ in range(n):
+        lat, lon = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+        raw = {"coord": {"lat": lat, "lon": lon}, **observation(lat, lon, now - rng.randint(0, 365 * 86400))}
+        samples.append({"lat": lat, "lon": lon, **transform_weather_data(raw)})
+    return samples
+
+def bench(fn: Callable, inputs: list, iterations: int, warmup: int, rows_per_call: int = 1) -> dict:
+    for i in range(warmup):
+        fn(inputs[i % len(inputs)])
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, elapsed, kind="micro", rows_per_call=rows_per_call, rows_per_s=iterations * rows_per_call / elapsed)
+
+def batches(items: list, size: int) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items) - size + 1, size)] or [items]
+
+def crop_args(sample: dict) -> tuple:
+    from utils.owa import convert_kelvin_to_celsius
+    return (
+        sample['lat'],
+        sample['lon'],
+        convert_kelvin_to_celsius(sample['temperature_2_m_above_gnd']),
+        sample['relative_humidity_2_m_above_gnd'],
+        sample['total_precipitation_sfc']
+    )
+
+def predictor_cases(samples: List[dict], batch_size: int, spark: bool) -> Dict[str, Callable[[], tuple]]:
+    from utils.airq import airq_input_from_weather, predict_aqi, predict_aqi_batch
+    from utils.registry import get_spark_crop_scorer, load_crop_recommender, registry
+    from utils.solar import predict_power_solar, predict_power_solar_batch, solar_input_from_weather
+    from utils.wind import predict_power_wind, predict_power_wind_batch, wind_input_from_weather
+
+    # Each case is built lazily so that a missing model artifact only skips
+    # its own benchmarks.
+    def solar():
+        rows = [solar_input_from_weather(sample) for sample in samples]
+        return predict_power_solar, rows, predict_power_solar_batch, batches(rows, batch_size)
+
+    def wind():
+        rows = [wind_input_from_weather(sample) for sample in samples]
+        return predict_power_wind, rows, predict_power_wind_batch, batches(rows, batch_size)
+
+    def airq():
+        rows = [airq_input_from_weather(sample) for sample in samples]
+        return predict_aqi, rows, predict_aqi_batch, batches(rows, batch_size)
+
+    def crop():
+        recommender = load_crop_recommender(registry.status()['crop']['path'])
+        return (lambda args: recommender.predict(*args)), [crop_args(sample) for sample in samples], None, None
+
+    def crop_engine():
+        engine = registry.get('crop').engine
+        return (lambda args: engine.predict(*args)), [crop_args(sample) for sample in samples], None, None
+
+    def spark_crop_local():
+        scorer = get_spark_crop_scorer()
+        return (lambda args: scorer.predict(*args)), [crop_args(sample) for sample in samples], None, None
+
+    def spark_crop():
+        if not spark:
+            raise Exception("pass --spark to benchmark SparkCropRecommender")
+
+        from pyspark.sql import SparkSession
+        from models_spark.crop_yield import SparkCropRecommender
+
+        session = SparkSession.builder.appName("CropRecommendationBench").master("local[*]").getOrCreate()
+        session.sparkContext.setLogLevel("ERROR")
+        recommender = SparkCropRecommender(session)
+        recommender.load_model(os.getenv('SPARK_CROP_MODEL_PATH', 'spark_crop_recommender'))
+        return (lambda args: recommender.predict(*args)), [crop_args(sample) for sample in samples], None, None
+
+    return {
+        "solar.predict_power_solar": solar,
+        "wind.predict_power_wind": wind,
+        "airq.predict_aqi": airq,
+        "crop.CropRecommender.predict": crop,
+        "crop.CropInferenceEngine.predict": crop_engine,
+        "spark_crop.LocalCropScorer.predict": spark_crop_local,
+        "spark_crop.SparkCropRecommender.predict": spark_crop
+    }
+
+def run_micro(iterations: int = 2000, warmup: int = 100, batch_size: int = 256, samples: int = 512, spark: bool = False) -> Dict[str, dict]:
+    weather = sample_weather(max(samples, batch_size))
+    results = {}
+
+    for name, build in predictor_cases(weather, batch_size, spark).items():
+        try:
+            single, inputs, batch, batch_inputs = build()
+            single(inputs[0])
+        except Exception as e:
+            print(f"Skipping {name}: {str(e)}")
+            results[f"micro.{name}"] = {"kind": "micro", "skipped": str(e)}
+            continue
+
+        case_iterations = iterations if not name.endswith("SparkCropRecommender.predict") else max(1, iterations // 50)
+        results[f"micro.{name}"] = bench(single, inputs, case_iterations, min(warmup, case_iterations))
+        print(f"micro.{name}: p50 {results[f'micro.{name}']['p50_ms']:.3f} ms")
+
+        if batch is not None:
+            batch_iterations = max(20, iterations // 10)
+            key = f"micro.{name}_batch[{batch_size}]"
+            results[key] = bench(batch, batch_inputs, batch_iterations, min(warmup, batch_iterations), rows_per_call=batch_size)
+            print(f"{key}: p50 {results[key]['p50_ms']:.3f} ms")
+
+    return results
@@ -0,0 +1,64 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+def summarize(latencies_s: List[float], elapsed_s: float = None, **extra) -> dict:
+    latencies = np.asarray(latencies_s, dtype=np.float64) * 1000
+    if latencies.size == 0:
+        return {"n": 0, **extra}
+
+    elapsed_s = elapsed_s if elapsed_s is not None else float(latencies.sum() / 1000)
+    return {
+        "n": int(latencies.size),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "throughput_per_s": float(latencies.size / elapsed_s) if elapsed_s else None,
+        **extra
+    }
+
+def git_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+def host_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+def build_report(config: dict, results: Dict[str, dict]) -> dict:
+    return {
+        "schema": SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "git": git_info(),
+        "host": host_info(),
+        "config": config,
+        "results": results
+    }
+
+def write_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("schema") != SCHEMA_VERSION:
+        raise Exception(f"Unsupported benchmark schema in '{path}': {report.get('schema')}")
+    return report
@@ -0,0 +1,130 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import httpx
+from benchmarks.results import build_report, write_report
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+DEFAULT_ENDPOINTS = ["/power", "/air_quality", "/crops_info", "/dashboard", "/forecast", "/power/batch"]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(proc: subprocess.Popen, url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise Exception(f"{' '.join(proc.args)} exited with code {proc.returncode} before {url} was ready")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise Exception(f"Timed out waiting for {url}")
+
+@contextmanager
+def process(args: list, env: dict, ready_url: str, timeout: float = 60):
+    proc = subprocess.Popen(args, cwd=ROOT_DIR, env=env)
+    try:
+        wait_until_ready(proc, ready_url, timeout)
+        yield proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def bench_env(**overrides) -> dict:
+    return {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT_DIR, SRC_DIR, os.getenv('PYTHONPATH')])),
+        **{key: str(value) for key, value in overrides.items()}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run predictor micro-benchmarks and HTTP load against local stubs")
+    parser.add_argument("--out", default=os.path.join(ROOT_DIR, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument("--owa-latency-ms", type=float, default=80)
+    parser.add_argument("--owa-jitter-ms", type=float, default=20)
+    parser.add_argument("--gemini-latency-ms", type=float, default=1500)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=300)
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per micro-benchmark")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--spark", action="store_true", help="Also benchmark SparkCropRecommender (needs a local Spark)")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per endpoint")
+    parser.add_argument("--coords", type=int, default=200, help="Distinct coordinates the load driver draws from")
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key != "out"}
+    results = {}
+
+    if not args.skip_micro:
+        from benchmarks.micro import run_micro
+        results.update(run_micro(iterations=args.iterations, batch_size=args.batch_size, spark=args.spark))
+
+    if not args.skip_load:
+        from benchmarks.load import run_load
+
+        owa_port, gemini_port, api_port = free_port(), free_port(), free_port()
+        workdir = tempfile.mkdtemp(prefix="vaidya-bench-")
+        stub = [sys.executable, "-m", "benchmarks.stubs"]
+        env = bench_env()
+        api_env = bench_env(
+            OWA_API_KEY="bench",
+            OWA_BASE_URL=f"http://127.0.0.1:{owa_port}/data/2.5",
+            GEMINI_API_KEY="bench",
+            GEMINI_API_ENDPOINT=f"http://127.0.0.1:{gemini_port}",
+            MODEL=os.getenv('MODEL', 'gemini-1.5-flash'),
+            ENRICHMENT_DB_PATH=os.path.join(workdir, "enrichment_cache.db"),
+            GRID_PATH=os.path.join(workdir, "national_grid.bin"),
+            SPARK_SERVICE_AUTOSTART=0,
+            WEB_CONCURRENCY=args.workers
+        )
+
+        with process(stub + ["owa", "--port", str(owa_port), "--latency-ms", str(args.owa_latency_ms), "--jitter-ms", str(args.owa_jitter_ms)],
+                     env, f"http://127.0.0.1:{owa_port}/docs"), \
+             process(stub + ["gemini", "--port", str(gemini_port), "--latency-ms", str(args.gemini_latency_ms), "--jitter-ms", str(args.gemini_jitter_ms)],
+                     env, f"http://127.0.0.1:{gemini_port}/docs"):
+
+            endpoints = args.endpoints.split(",")
+            if "/grid/point" in endpoints:
+                subprocess.run([sys.executable, "-m", "utils.grid"], cwd=ROOT_DIR, env=api_env, check=True)
+
+            api = [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--app-dir", SRC_DIR,
+                "--port", str(api_port),
+                "--workers", str(args.workers),
+                "--log-level", "warning"
+            ]
+            with process(api, api_env, f"http://127.0.0.1:{api_port}/health", timeout=180):
+                results.update(run_load(
+                    f"http://127.0.0.1:{api_port}",
+                    endpoints,
+                    concurrency=args.concurrency,
+                    duration=args.duration,
+                    coords=args.coords
+                ))
+
+    report = build_report(config, results)
+    write_report(report, args.out)
+    print(f"Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
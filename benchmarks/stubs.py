@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from fastapi import FastAPI, Request
+
+OWA_PREFIX = "/data/2.5"
+
+CROP_PESTS = ["Aphids", "Stem borer", "Whitefly", "Armyworm", "Thrips", "Leaf folder"]
+CROP_DISEASES = ["Leaf blight", "Powdery mildew", "Rust", "Root rot", "Bacterial wilt", "Mosaic virus"]
+
+
+class Latency:
+    def __init__(self, mean_ms: float, jitter_ms: float, seed: int = 0):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+
+    async def wait(self):
+        delay = max(0.0, self.random.gauss(self.mean_ms, self.jitter_ms)) if self.jitter_ms else self.mean_ms
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+def observation(lat: float, lon: float, dt: int) -> dict:
+    # Seeded per location and hour so repeated requests see a stable,
+    # plausible climate: warmer towards the equator, a diurnal swing and
+    # monsoon-ish humidity.
+    rng = random.Random(f"{round(lat, 2)}:{round(lon, 2)}:{dt // 3600}")
+    hour = (dt // 3600 + lon / 15) % 24
+    temp = 273.15 + 34 - 0.45 * abs(lat) + 6 * math.sin((hour - 9) / 24 * 2 * math.pi) + rng.uniform(-2, 2)
+    humidity = min(100, max(5, 60 + 25 * math.cos(lat / 10) + rng.uniform(-15, 15)))
+    clouds = rng.choice([0, 0, 8, 20, 40, 75, 90, 100])
+    speed = round(rng.uniform(0.3, 9.5), 2)
+    pressure = int(rng.uniform(998, 1016))
+
+    item = {
+        "weather": [{"id": 803 if clouds > 50 else 800, "main": "Clouds" if clouds > 50 else "Clear", "description": "stub", "icon": "01d"}],
+        "main": {
+            "temp": round(temp, 2),
+            "feels_like": round(temp + rng.uniform(-1, 3), 2),
+            "temp_min": round(temp - 1.5, 2),
+            "temp_max": round(temp + 1.5, 2),
+            "pressure": pressure,
+            "humidity": int(humidity),
+            "sea_level": pressure,
+            "grnd_level": pressure - int(rng.uniform(0, 40))
+        },
+        "visibility": 10000,
+        "wind": {"speed": speed, "deg": int(rng.uniform(0, 360)), "gust": round(speed * rng.uniform(1.1, 1.8), 2)},
+        "clouds": {"all": clouds},
+        "dt": dt
+    }
+    if clouds >= 75 and rng.random() < 0.5:
+        item["rain"] = {"1h": round(rng.uniform(0.1, 6), 2)}
+    return item
+
+def owa_app(latency: Latency) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(f"{OWA_PREFIX}/weather")
+    async def weather(lat: float, lon: float, appid: str = None):
+        await latency.wait()
+        return {
+            "coord": {"lon": lon, "lat": lat},
+            "base": "stations",
+            **observation(lat, lon, int(time.time())),
+            "sys": {"country": "IN"},
+            "timezone": 19800,
+            "id": 0,
+            "name": "Stub",
+            "cod": 200
+        }
+
+    @app.get(f"{OWA_PREFIX}/forecast")
+    async def forecast(lat: float, lon: float, appid: str = None, cnt: int = 40):
+        await latency.wait()
+        start = int(time.time()) // 10800 * 10800 + 10800
+        items = []
+        for step in range(min(cnt, 40)):
+            item = observation(lat, lon, start + step * 10800)
+            if "rain" in item:
+                item["rain"] = {"3h": round(item["rain"]["1h"] * 3, 2)}
+            items.append(item)
+        return {
+            "cod": "200",
+            "cnt": len(items),
+            "list": items,
+            "city": {"coord": {"lat": lat, "lon": lon}, "country": "IN", "timezone": 19800}
+        }
+
+    return app
+
+def gemini_app(latency: Latency) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate_content(model_action: str, request: Request):
+        await latency.wait()
+        body = await request.json()
+        text = " ".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        match = re.search(r"\[[^\[\]]*\]\s*$", text)
+        crops = json.loads(match.group(0)) if match else []
+
+        rng = random.Random(text)
+        payload = [
+            {
+                "crop": crop,
+                "pests": [{"name": name, "description": f"{name} commonly found on {crop}."} for name in rng.sample(CROP_PESTS, 2)],
+                "diseases": [{"name": name, "description": f"{name} affecting {crop}."} for name in rng.sample(CROP_DISEASES, 2)]
+            }
+            for crop in crops
+        ]
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": f"```json\n{json.dumps(payload)}\n```"}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": len(text) // 4, "candidatesTokenCount": 200, "totalTokenCount": len(text) // 4 + 200}
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenWeatherMap and Gemini stand-ins for benchmarking")
+    parser.add_argument("service", choices=["owa", "gemini"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mean added response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Standard deviation of the added latency")
+    args = parser.parse_args()
+
+    import uvicorn
+    latency = Latency(args.latency_ms, args.jitter_ms)
+    app = owa_app(latency) if args.service == "owa" else gemini_app(latency)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
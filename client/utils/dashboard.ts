@@ -0,0 +1,52 @@
+import { aqi } from '~/utils/air-quality';
+import { cropRecommendations, loading as cropsLoading, error as cropsError } from '~/utils/crops';
+import { applyPowerData, loading as powerLoading, error as powerError } from '~/utils/power';
+
+type MyLocation = {
+    lat: number;
+    lon: number;
+}
+
+export const fetchDashboard = async (coords: Ref<MyLocation>) => {
+    cropsLoading.value = true;
+    powerLoading.value = true;
+    cropsError.value = null;
+    powerError.value = null;
+    try {
+        const response = await fetch('http://localhost:8000/dashboard', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                lat: coords.value.lat,
+                lon: coords.value.lon
+            })
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+
+        applyPowerData(data);
+
+        if (typeof data?.aqi === 'number') {
+            aqi.value = data.aqi;
+        }
+
+        if (Array.isArray(data?.crops)) {
+            cropRecommendations.value = data.crops;
+        } else {
+            cropsError.value = 'Failed to fetch crop data. Please try again later.';
+        }
+    } catch (err) {
+        cropsError.value = 'Failed to fetch crop data. Please try again later.';
+        powerError.value = 'Failed to fetch power data. Please try again later.';
+        console.error('Error fetching dashboard data:', err);
+    } finally {
+        cropsLoading.value = false;
+        powerLoading.value = false;
+    }
+};
@@ -34,6 +34,28 @@ export const gridData = ref({
 export const loading = ref(true);
 export const error = ref<string | null>(null);
 
+export const applyPowerData = (data: any) => {
+    if (data?.solar?.predicted_power_kw) {
+        const predictedSolarPower = data.solar.predicted_power_kw;
+        solarData.value = {
+            currentOutput: parseFloat((predictedSolarPower / 1000).toFixed(1)),
+            daily: Math.round(predictedSolarPower * 24 / 1000),
+            weekly: Math.round(predictedSolarPower * 24 * 7 / 1000),
+            monthly: Math.round(predictedSolarPower * 24 * 30 / 1000)
+        };
+    }
+
+    if (data?.wind?.predicted_power) {
+        const predictedWindPower = data.wind.predicted_power;
+        windData.value = {
+            currentOutput: predictedWindPower.toFixed(1),
+            daily: Math.round(predictedWindPower * 24),
+            weekly: Math.round(predictedWindPower * 24 * 7),
+            monthly: Math.round(predictedWindPower * 24 * 30)
+        };
+    }
+};
+
 export const fetchPowerData = async (coords: Ref<MyLocation>) => {
     try {
         loading.value = true;
@@ -56,25 +78,7 @@ export const fetchPowerData = async (coords: Ref<MyLocation>) => {
 
         const data = await response.json();
 
-        if (data?.solar?.predicted_power_kw) {
-            const predictedSolarPower = data.solar.predicted_power_kw;
-            solarData.value = {
-                currentOutput: parseFloat((predictedSolarPower / 1000).toFixed(1)),
-                daily: Math.round(predictedSolarPower * 24 / 1000),
-                weekly: Math.round(predictedSolarPower * 24 * 7 / 1000),
-                monthly: Math.round(predictedSolarPower * 24 * 30 / 1000)
-            };
-        }
-
-        if (data?.wind?.predicted_power) {
-            const predictedWindPower = data.wind.predicted_power;
-            windData.value = {
-                currentOutput: predictedWindPower.toFixed(1),
-                daily: Math.round(predictedWindPower * 24),
-                weekly: Math.round(predictedWindPower * 24 * 7),
-                monthly: Math.round(predictedWindPower * 24 * 30)
-            };
-        }
+        applyPowerData(data);
 
     } catch (err) {
         error.value = 'Failed to fetch power data. Please try again later.';
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+from starlette.requests import Request
+from services.spark_client import spark_service
+from utils.executors import executor
+from utils.owa import weather_cache
+from utils.prediction_cache import prediction_cache_stats
+from utils.profiler import PROFILE_INTERVAL_MS, profiler
+from utils.registry import registry
+from utils.tracing import collector as trace_collector
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+MODEL_DIR = os.path.realpath(os.getenv('MODEL_DIR') or os.getcwd())
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def require_admin(request: Request):
+    # With ADMIN_TOKEN set, every admin call must present it. Without one,
+    # only non-browser clients on this host are let through.
+    if ADMIN_TOKEN:
+        supplied = request.headers.get("x-admin-token", "")
+        if not secrets.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Invalid admin token")
+        return
+
+    if request.client is None or request.client.host not in LOOPBACK_HOSTS or "origin" in request.headers:
+        raise HTTPException(status_code=403, detail="Admin endpoints are only served to local clients unless ADMIN_TOKEN is set")
+
+def model_path(path: Optional[str]) -> Optional[str]:
+    if path is None:
+        return None
+
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([resolved, MODEL_DIR]) != MODEL_DIR:
+        raise Exception(f"Model paths must be under {MODEL_DIR}")
+    return path
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@router.get("/models")
+async def models():
+    return registry.status()
+
+@router.post("/models/{name}/reload")
+async def reload_model(name: str, request: Request):
+    try:
+        body = await request.json() if await request.body() else {}
+        entry = await executor.run_io(registry.load, name, model_path(body.get('path')))
+        
+        return {
+            "name": entry.name,
+            "path": entry.path,
+            "version": entry.version,
+            "status": "ok"
+        }
+        
+    except Exception as e:
+        return {"error": f"Reload error: {str(e)}"}
+
+@router.get("/spark")
+async def spark_status():
+    try:
+        return await executor.run_io(spark_service.ping, endpoint="spark")
+    except Exception as e:
+        return {"error": f"Spark service error: {str(e)}"}
+
+@router.get("/hive_writer")
+async def hive_writer_stats():
+    try:
+        response = await executor.run_io(spark_service.stats, endpoint="spark")
+        return response["hive_writer"]
+    except Exception as e:
+        return {"error": f"Spark service error: {str(e)}"}
+
+@router.post("/hive_writer/flush")
+async def hive_writer_flush():
+    try:
+        response = await executor.run_io(spark_service.flush, endpoint="spark")
+        return response["hive_writer"]
+    except Exception as e:
+        return {"error": f"Flush error: {str(e)}"}
+
+@router.get("/executors")
+async def executors():
+    return executor.stats()
+
+@router.get("/caches")
+async def caches():
+    return {
+        "weather": weather_cache.stats(),
+        "predictions": prediction_cache_stats()
+    }
+
+@router.get("/traces")
+async def traces(min_ms: float = 0, name: Optional[str] = None, limit: int = 50, sort: str = "recent"):
+    return trace_collector.summaries(min_ms, name, max(1, limit), slowest=sort == "slowest")
+
+@router.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    tree = trace_collector.tree(trace_id)
+    if tree is None:
+        return {"error": f"Unknown trace '{trace_id}'"}
+
+    return tree
+
+@router.post("/profile")
+async def profile(seconds: float = 10, fraction: float = 1.0, interval_ms: float = PROFILE_INTERVAL_MS, idle: bool = False):
+    try:
+        session = profiler.start(seconds, fraction, interval_ms / 1000, idle)
+    except Exception as e:
+        return {"error": f"Profiler error: {str(e)}"}
+
+    try:
+        await asyncio.sleep(session.seconds)
+    finally:
+        result = profiler.stop(session)
+
+    return Response(result["collapsed"], media_type="text/plain", headers={
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Requests": str(result["requests"])
+    })
@@ -1,22 +1,83 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from admin import router as admin_router
 from routes import router
-from services.spark_hive import create_db_and_tables
+from services.spark_client import spark_service
+from utils.enrichment_jobs import enrichment_jobs
+from utils.gem import enrichment_store
+from utils.executors import executor
+from utils.grid import GRID_REFRESH_MINUTES, refresh_forever
+from utils.metrics import REQUEST_LATENCY, clear_multiproc_dir, stats_collector
+from utils.owa import forecast_cache, owa_client, weather_cache
+from utils.prediction_cache import prediction_cache_stats
+from utils.profiler import profiler
+from utils.registry import registry
+from utils.tracing import collector as trace_collector, start_trace
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.add_listener(executor.restart_cpu_pool)
+    registry.load_all()
+    registry.watch(float(os.getenv('MODEL_WATCH_INTERVAL', '0')))
+    grid_task = None
+    if GRID_REFRESH_MINUTES > 0:
+        grid_task = asyncio.create_task(refresh_forever(GRID_REFRESH_MINUTES, run_cpu=executor.run_cpu))
+    yield
+    if grid_task is not None:
+        grid_task.cancel()
+    registry.stop_watching()
+    enrichment_jobs.shutdown()
+    executor.shutdown()
+    await owa_client.aclose()
+    trace_collector.close()
+
+app = FastAPI(lifespan=lifespan)
+
+CORS_ORIGINS = [origin.strip() for origin in os.getenv('CORS_ORIGINS', '*').split(',') if origin.strip()]
+
+stats_collector.add_caches(lambda: {
+    "weather": weather_cache.stats(),
+    "forecast": forecast_cache.stats(),
+    "enrichment": enrichment_store.stats()
+})
+stats_collector.add_caches(prediction_cache_stats)
+stats_collector.set_spark_stats(spark_service.metrics)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    with start_trace(request.method, path=request.url.path) as trace, profiler.request():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            if trace is not None:
+                response.headers["X-Trace-Id"] = trace.trace_id
+            return response
+        finally:
+            route = request.scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            if trace is not None:
+                trace.name = f"{request.method} {route}"
+                trace.attributes["status"] = status
+            REQUEST_LATENCY.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS,
+    allow_credentials="*" not in CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-create_db_and_tables()
-
 app.include_router(router)
+app.include_router(admin_router)
 
 if __name__ == "__main__":
     import uvicorn
+    clear_multiproc_dir()
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -1,14 +1,51 @@
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, mean, collect_list, lit, when
+from pyspark.sql.functions import broadcast, count, lit, mean
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType
 from pyspark.ml.feature import VectorAssembler, StandardScaler, StringIndexer
 from pyspark.ml.classification import MultilayerPerceptronClassifier
 from pyspark.ml import Pipeline
 from pyspark.ml.pipeline import PipelineModel
 from pyspark.ml.evaluation import MulticlassClassificationEvaluator
-import pandas as pd
+from pyspark.ml.tuning import CrossValidator, ParamGridBuilder
+import argparse
 import json
 import os
+import time
 from dotenv import load_dotenv
+from models_spark.export import export_pipeline_model, check_parity, sample_inputs
+from models_spark.states import STATE_COORDINATES
+
+CSV_SCHEMA = StructType([
+    StructField('N_SOIL', DoubleType()),
+    StructField('P_SOIL', DoubleType()),
+    StructField('K_SOIL', DoubleType()),
+    StructField('TEMPERATURE', DoubleType()),
+    StructField('HUMIDITY', DoubleType()),
+    StructField('ph', DoubleType()),
+    StructField('RAINFALL', DoubleType()),
+    StructField('STATE', StringType()),
+    StructField('CROP_PRICE', DoubleType()),
+    StructField('CROP', StringType())
+])
+
+DEFAULT_HIDDEN_LAYERS = ([64, 64], [128, 128], [256, 128])
+DEFAULT_MAX_ITERS = (100, 200)
+
+def plan_size(df) -> int:
+    # Operators in the analyzed logical plan, i.e. what Catalyst has to
+    # resolve before anything runs.
+    return len(df._jdf.queryExecution().analyzed().treeString().strip().splitlines())
+
+def read_training_csv(spark, input_path, state_coordinates=STATE_COORDINATES):
+    # One broadcast join instead of a when/otherwise chain per state, so the
+    # plan stays the same size however many regions are added.
+    states = spark.createDataFrame(
+        [(state, float(lat), float(lon)) for state, (lat, lon) in state_coordinates.items()],
+        ['STATE', 'LATITUDE', 'LONGITUDE']
+    )
+    return spark.read.csv(input_path, header=True, schema=CSV_SCHEMA) \
+        .join(broadcast(states), on='STATE', how='left') \
+        .fillna(0.0, subset=['LATITUDE', 'LONGITUDE'])
 
 class SparkCropRecommender:
     def __init__(self, spark):
@@ -17,73 +54,43 @@ class SparkCropRecommender:
         self.target_features = ['N_SOIL', 'P_SOIL', 'K_SOIL', 'ph', 'CROP_PRICE']
         self.model = None
         self.pipeline = None
+        self.classifier = None
         self.label_indexer = None
+        self.report = {}
         self.crop_stats = {}
         self.label_indexer_model = None
         
         with open ('crop_stats_test_spark.txt', 'r') as f:
             self.crop_stats = json.load(f)
             
-        self.state_coordinates = {
-            'Andaman and Nicobar': (10.7449, 92.5000),
-            'Andhra Pradesh': (15.9129, 79.7400),
-            'Assam': (26.2006, 92.9376),
-            'Chattisgarh': (21.2787, 81.8661),
-            'Goa': (15.2993, 74.1240),
-            'Gujarat': (22.6708, 71.5724),
-            'Haryana': (29.0588, 76.0856),
-            'Himachal Pradesh': (32.1024, 77.5619),
-            'Jammu and Kashmir': (33.2778, 75.3412),
-            'Karnataka': (15.3173, 75.7139),
-            'Kerala': (10.1632, 76.6413),
-            'Madhya Pradesh': (22.9734, 78.6569),
-            'Maharashtra': (19.7515, 75.7139),
-            'Manipur': (24.6637, 93.9063),
-            'Meghalaya': (25.4670, 91.3662),
-            'Nagaland': (26.1584, 94.5624),
-            'Odisha': (20.2376, 84.2700),
-            'Pondicherry': (11.9416, 79.8083),
-            'Punjab': (31.1471, 75.3412),
-            'Rajasthan': (27.0238, 74.2179),
-            'Tamil Nadu': (11.1271, 78.6569),
-            'Telangana': (18.1124, 79.0193),
-            'Tripura': (23.5639, 91.6761),
-            'Uttar Pradesh': (27.5706, 80.0982),
-            'Uttrakhand': (29.2163, 79.0108),
-            'West Bengal': (22.9868, 87.8550)
-        }
+        self.state_coordinates = STATE_COORDINATES
         
     def prepare_data(self, input_path):
-        pdf = pd.read_csv(input_path)
-        df = self.spark.createDataFrame(pdf)
-        
-        df = df.withColumn('LATITUDE', lit(0.0))
-        df = df.withColumn('LONGITUDE', lit(0.0))
-        
-        for state, (lat, long) in self.state_coordinates.items():
-            df = df.withColumn(
-                'LATITUDE',
-                when(col('STATE') == state, lit(float(lat))).otherwise(col('LATITUDE'))
-            )
-            df = df.withColumn(
-                'LONGITUDE',
-                when(col('STATE') == state, lit(float(long))).otherwise(col('LONGITUDE'))
-            )
-        
+        started = time.perf_counter()
         self.spark.sparkContext.setLogLevel("ERROR")
-        
+
+        df = read_training_csv(self.spark, input_path, self.state_coordinates).cache()
+
+        # The first action over the cached frame both materializes it and
+        # computes the per-crop averages, so the CSV is scanned once.
         crop_stats_df = df.groupBy('CROP').agg(
+            count(lit(1)).alias('rows'),
             mean('N_SOIL').alias('avg_N'),
             mean('P_SOIL').alias('avg_P'),
             mean('K_SOIL').alias('avg_K'),
             mean('ph').alias('avg_ph'),
             mean('CROP_PRICE').alias('avg_price')
-        )
-        
+        ).collect()
+
         self.crop_stats = {row['CROP']: {
             'avg_params': [row['avg_N'], row['avg_P'], row['avg_K'], row['avg_ph']],
             'avg_price': row['avg_price']
-        } for row in crop_stats_df.collect()}
+        } for row in crop_stats_df}
+
+        self.report['rows'] = sum(row['rows'] for row in crop_stats_df)
+        self.report['crops'] = len(self.crop_stats)
+        self.report['plan_size'] = plan_size(df)
+        self.report['prepare_seconds'] = time.perf_counter() - started
         
         assembler = VectorAssembler(
             inputCols=self.feature_names,
@@ -102,10 +109,9 @@ class SparkCropRecommender:
             outputCol="label"
         )
 
-        layers = [len(self.feature_names), 128, 128, len(self.crop_stats)]
-        classifier = MultilayerPerceptronClassifier(
+        self.classifier = MultilayerPerceptronClassifier(
             maxIter=100,
-            layers=layers,
+            layers=[len(self.feature_names), 128, 128, len(self.crop_stats)],
             featuresCol="scaledFeatures",
             labelCol="label",
             predictionCol="prediction",
@@ -116,25 +122,53 @@ class SparkCropRecommender:
             assembler,
             scaler,
             self.label_indexer,
-            classifier
+            self.classifier
         ])
         
         return df
     
-    def train(self, df):
+    def train(self, df, hidden_layers=DEFAULT_HIDDEN_LAYERS, max_iters=DEFAULT_MAX_ITERS, folds=3, parallelism=None):
+        started = time.perf_counter()
         train_data, test_data = df.randomSplit([0.8, 0.2], seed=42)
 
-        self.model = self.pipeline.fit(train_data)
-        
-        self.label_indexer_model = self.model.stages[2]
-        
-        predictions = self.model.transform(test_data)
         evaluator = MulticlassClassificationEvaluator(
             labelCol="label",
             predictionCol="prediction",
             metricName="accuracy"
         )
-        accuracy = evaluator.evaluate(predictions)
+
+        n_classes = len(self.crop_stats)
+        param_grid = ParamGridBuilder() \
+            .addGrid(self.classifier.layers, [[len(self.feature_names), *hidden, n_classes] for hidden in hidden_layers]) \
+            .addGrid(self.classifier.maxIter, list(max_iters)) \
+            .build()
+
+        # Candidates are independent fits, so they run concurrently on the
+        # driver (one Spark job each) rather than one after another.
+        cross_validator = CrossValidator(
+            estimator=self.pipeline,
+            estimatorParamMaps=param_grid,
+            evaluator=evaluator,
+            numFolds=folds,
+            parallelism=parallelism or min(len(param_grid), os.cpu_count() or 1),
+            seed=42
+        )
+        cv_model = cross_validator.fit(train_data)
+
+        self.model = cv_model.bestModel
+        self.label_indexer_model = self.model.stages[2]
+
+        accuracy = evaluator.evaluate(self.model.transform(test_data))
+        best = max(zip(cv_model.avgMetrics, param_grid), key=lambda item: item[0])[1]
+
+        self.report['candidates'] = [
+            {"layers": params[self.classifier.layers], "max_iter": params[self.classifier.maxIter], "cv_accuracy": metric}
+            for metric, params in zip(cv_model.avgMetrics, param_grid)
+        ]
+        self.report['best'] = {"layers": best[self.classifier.layers], "max_iter": best[self.classifier.maxIter]}
+        self.report['test_accuracy'] = accuracy
+        self.report['train_seconds'] = time.perf_counter() - started
+
         print(f"Test Accuracy = {accuracy}")
         
         return self.model
@@ -177,7 +211,14 @@ class SparkCropRecommender:
 
     def load_model(self, model_path):
         self.model = PipelineModel.load(model_path)
-        self.label_indexer_model = self.model.stages[2] 
+        self.label_indexer_model = self.model.stages[2]
+
+        # Releases published by models_spark.incremental keep their stats
+        # next to the model directory.
+        stats_path = os.path.join(os.path.dirname(os.path.normpath(model_path)), 'crop_stats.json')
+        if os.path.exists(stats_path):
+            with open(stats_path, 'r') as f:
+                self.crop_stats = json.load(f)
         print("Model loaded successfully from", model_path)
 
 def save_crop_stats(recommender, output_path):
@@ -186,6 +227,16 @@ def save_crop_stats(recommender, output_path):
     print("Crop stats saved successfully!")
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the Spark crop recommender")
+    parser.add_argument('--input', default='src/data/indiancrop_dataset.csv')
+    parser.add_argument('--hidden-layers', default=';'.join(','.join(map(str, hidden)) for hidden in DEFAULT_HIDDEN_LAYERS),
+                        help="Hidden layer sizes to search, e.g. '64,64;128,128'")
+    parser.add_argument('--max-iter', default=','.join(map(str, DEFAULT_MAX_ITERS)), help="maxIter values to search")
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--parallelism', type=int, default=None)
+    parser.add_argument('--report', default=None, help="Write the training report as JSON")
+    args = parser.parse_args()
+
     spark = SparkSession.builder \
         .appName("CropRecommendation") \
         .config("spark.driver.host", 'localhost') \
@@ -199,8 +250,24 @@ def main():
         
     recommender = SparkCropRecommender(spark)
     
-    df = recommender.prepare_data('src/data/indiancrop_dataset.csv')
-    model = recommender.train(df)
+    df = recommender.prepare_data(args.input)
+    model = recommender.train(
+        df,
+        hidden_layers=[[int(size) for size in hidden.split(',')] for hidden in args.hidden_layers.split(';')],
+        max_iters=[int(value) for value in args.max_iter.split(',')],
+        folds=args.folds,
+        parallelism=args.parallelism
+    )
+    df.unpersist()
+
+    report = recommender.report
+    print(f"Prepared {report['rows']} rows ({report['crops']} crops) in {report['prepare_seconds']:.1f}s, plan size {report['plan_size']}")
+    for candidate in report['candidates']:
+        print(f"  layers={candidate['layers']} maxIter={candidate['max_iter']}: cv accuracy {candidate['cv_accuracy']:.4f}")
+    print(f"Best: layers={report['best']['layers']} maxIter={report['best']['max_iter']}, trained in {report['train_seconds']:.1f}s")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=4)
     
     save_crop_stats(recommender, 'crop_stats_test_spark.txt')
     
@@ -230,6 +297,15 @@ def main():
     
     model.save("spark_crop_recommender")
     
+    scorer = export_pipeline_model(model, "spark_crop_recommender.npz")
+    result = check_parity(spark, model, scorer, sample_inputs(200))
+    print("Parity check:", result)
+    if not result['ok']:
+        # /crops_info_spark serves this file, so never leave a mismatched one behind.
+        os.remove("spark_crop_recommender.npz")
+        spark.stop()
+        raise SystemExit("Local scorer does not match the Spark pipeline")
+    
     spark.stop()
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import argparse
+import numpy as np
+from pyspark.sql import SparkSession
+from pyspark.ml.pipeline import PipelineModel
+from models_spark.local_scorer import LocalCropScorer
+
+
+def export_pipeline_model(model, artifact_path=None):
+    assembler, scaler, label_indexer, classifier = model.stages
+
+    layers = list(classifier.getLayers())
+    flat_weights = classifier.weights.toArray()
+
+    weights = []
+    biases = []
+    offset = 0
+    for n_in, n_out in zip(layers[:-1], layers[1:]):
+        # Spark stores each affine layer as a column-major (n_out, n_in) matrix
+        # followed by its bias, so a row-major (n_in, n_out) reshape is W^T.
+        weights.append(flat_weights[offset:offset + n_in * n_out].reshape(n_in, n_out))
+        offset += n_in * n_out
+        biases.append(flat_weights[offset:offset + n_out])
+        offset += n_out
+
+    scorer = LocalCropScorer(
+        feature_names=assembler.getInputCols(),
+        mean=scaler.mean.toArray(),
+        std=scaler.std.toArray(),
+        with_mean=scaler.getWithMean(),
+        with_std=scaler.getWithStd(),
+        weights=weights,
+        biases=biases,
+        labels=label_indexer.labels
+    )
+
+    if artifact_path:
+        scorer.save(artifact_path)
+        print("Local scorer exported to", artifact_path)
+
+    return scorer
+
+def check_parity(spark, model, scorer, samples, atol=1e-6):
+    pred_data = spark.createDataFrame(samples, scorer.feature_names)
+    spark_probs = np.array([
+        row['probability'].toArray() for row in model.transform(pred_data).select("probability").collect()
+    ])
+    local_probs = scorer.predict_proba(samples)
+
+    max_diff = float(np.abs(spark_probs - local_probs).max())
+    top_3_match = bool(np.array_equal(
+        np.argsort(-spark_probs, axis=1)[:, :3],
+        np.argsort(-local_probs, axis=1)[:, :3]
+    ))
+
+    return {
+        "samples": len(samples),
+        "max_abs_diff": max_diff,
+        "top_3_match": top_3_match,
+        "ok": max_diff <= atol and top_3_match
+    }
+
+def sample_inputs(n, seed=42):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(8.0, 34.0, n),
+        rng.uniform(68.0, 97.0, n),
+        rng.uniform(5.0, 45.0, n),
+        rng.uniform(10.0, 100.0, n),
+        rng.uniform(0.0, 300.0, n)
+    ]).tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Spark crop pipeline to a NumPy artifact")
+    parser.add_argument('--model', default='spark_crop_recommender')
+    parser.add_argument('--out', default='spark_crop_recommender.npz')
+    parser.add_argument('--check', type=int, default=200, help="Number of random inputs for the parity check (0 to skip)")
+    args = parser.parse_args()
+
+    spark = SparkSession.builder \
+        .appName("CropRecommendationExport") \
+        .config("spark.driver.host", 'localhost') \
+        .config("spark.driver.bindAddress", "localhost") \
+        .master("local[*]") \
+        .getOrCreate()
+    
+    spark.sparkContext.setLogLevel("ERROR")
+
+    model = PipelineModel.load(args.model)
+    scorer = export_pipeline_model(model, args.out)
+
+    if args.check:
+        result = check_parity(spark, model, scorer, sample_inputs(args.check))
+        print("Parity check:", result)
+        if not result['ok']:
+            spark.stop()
+            raise SystemExit("Local scorer does not match the Spark pipeline")
+
+    spark.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import fcntl
+import json
+import math
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+import httpx
+from pyspark.ml.classification import MultilayerPerceptronClassifier
+from pyspark.ml.evaluation import MulticlassClassificationEvaluator
+from pyspark.ml.pipeline import PipelineModel
+from pyspark.sql.functions import col, count, lit, sum as spark_sum
+from models_spark.crop_yield import read_training_csv
+from models_spark.export import export_pipeline_model
+from services.spark_hive import get_spark, read_from_crops
+
+RELEASES_DIR = os.getenv('SPARK_CROP_RELEASES_DIR', 'spark_crop_releases')
+CURRENT_LINK = os.getenv('SPARK_CROP_CURRENT', 'spark_crop_current')
+RELEASES_KEEP = int(os.getenv('SPARK_CROP_RELEASES_KEEP', '5'))
+# Rows reach crops_table through the write-behind buffer, so a row can land
+# after newer ones. Only rows older than this are folded in.
+WATERMARK_LAG_SECONDS = float(os.getenv('RETRAIN_WATERMARK_LAG', '300'))
+
+TARGETS = ['N_SOIL', 'P_SOIL', 'K_SOIL', 'ph', 'CROP_PRICE']
+# crops_table stores estimated_price after utils.crops.format_recommendations
+# has divided it by 50; the CSV and crop_stats use the undivided price.
+TABLE_PRICE_SCALE = 50
+
+# crops_table holds the API's own top-1 recommendations: the crop is the
+# serving model's argmax and N/P/K/pH are the crop_stats means it echoed.
+# Folding these rows in reinforces what the model already predicts (and the
+# accuracy gate in warm_start compares against those same self-labels), so
+# this pipeline tracks serving drift rather than learning from observed
+# outcomes until rows with observed labels are written to the table.
+CROPS_TABLE_COLUMNS = {
+    'lat': 'LATITUDE',
+    'lon': 'LONGITUDE',
+    'temperature': 'TEMPERATURE',
+    'humidity': 'HUMIDITY',
+    'rainfall': 'RAINFALL',
+    'N': 'N_SOIL',
+    'P': 'P_SOIL',
+    'K': 'K_SOIL',
+    'pH': 'ph',
+    'price': 'CROP_PRICE',
+    'crop': 'CROP'
+}
+
+def aggregate(df) -> dict:
+    # Per-crop count, sums and sums of squares: enough to merge with earlier
+    # runs and recover means and standard deviations without a rescan.
+    exprs = [count(lit(1)).alias('count')]
+    for i, target in enumerate(TARGETS):
+        exprs.append(spark_sum(col(target)).alias(f'sum_{i}'))
+        exprs.append(spark_sum(col(target) * col(target)).alias(f'sumsq_{i}'))
+
+    return {
+        row['CROP']: {
+            'count': row['count'],
+            'sum': [row[f'sum_{i}'] or 0.0 for i in range(len(TARGETS))],
+            'sumsq': [row[f'sumsq_{i}'] or 0.0 for i in range(len(TARGETS))]
+        }
+        for row in df.groupBy('CROP').agg(*exprs).collect()
+    }
+
+def merge_aggregates(total: dict, new: dict) -> dict:
+    merged = {crop: {key: value if key == 'count' else list(value) for key, value in agg.items()} for crop, agg in total.items()}
+    for crop, agg in new.items():
+        if crop not in merged:
+            merged[crop] = agg
+            continue
+        merged[crop]['count'] += agg['count']
+        merged[crop]['sum'] = [a + b for a, b in zip(merged[crop]['sum'], agg['sum'])]
+        merged[crop]['sumsq'] = [a + b for a, b in zip(merged[crop]['sumsq'], agg['sumsq'])]
+    return merged
+
+def crop_stats_from(aggregates: dict) -> dict:
+    stats = {}
+    for crop, agg in aggregates.items():
+        n = agg['count']
+        means = [value / n for value in agg['sum']]
+        stds = [math.sqrt(max(0.0, sumsq / n - m * m)) for sumsq, m in zip(agg['sumsq'], means)]
+        stats[crop] = {
+            'avg_params': means[:4],
+            'avg_price': means[4],
+            'std_params': stds[:4],
+            'std_price': stds[4],
+            'count': n
+        }
+    return stats
+
+def read_new_rows(start: datetime, end: datetime):
+    # [start, end) matches read_table, so consecutive windows never overlap.
+    df = read_from_crops(start=start, end=end, columns=list(CROPS_TABLE_COLUMNS))
+    return df.select(*(
+        (col(name) * TABLE_PRICE_SCALE if name == 'price' else col(name)).alias(alias)
+        for name, alias in CROPS_TABLE_COLUMNS.items()
+    ))
+
+def accuracy(model, df) -> float:
+    evaluator = MulticlassClassificationEvaluator(labelCol="label", predictionCol="prediction", metricName="accuracy")
+    return evaluator.evaluate(model.transform(df))
+
+def warm_start(previous: PipelineModel, df, max_iter: int, holdout: float, max_drop: float, report: dict) -> PipelineModel:
+    assembler, scaler, label_indexer, classifier = previous.stages
+
+    # Keep the fitted scaler and label index so the previous weights still
+    # line up with their inputs and outputs; crops the model has never seen
+    # need a full retrain and are left out here.
+    prepare = PipelineModel(stages=[assembler, scaler, label_indexer.copy({label_indexer.handleInvalid: 'skip'})])
+    prepared = prepare.transform(df).cache()
+    train_data, test_data = prepared.randomSplit([1 - holdout, holdout], seed=42)
+
+    fitted = MultilayerPerceptronClassifier(
+        layers=list(classifier.getLayers()),
+        initialWeights=classifier.weights,
+        maxIter=max_iter,
+        featuresCol="scaledFeatures",
+        labelCol="label",
+        predictionCol="prediction",
+        seed=42
+    ).fit(train_data)
+    candidate = PipelineModel(stages=[assembler, scaler, label_indexer, fitted])
+
+    report['previous_accuracy'] = accuracy(classifier, test_data)
+    report['accuracy'] = accuracy(fitted, test_data)
+    prepared.unpersist()
+
+    if report['accuracy'] < report['previous_accuracy'] - max_drop:
+        report['retrained'] = False
+        report['reason'] = "accuracy dropped on held-out new rows"
+        return previous
+
+    report['retrained'] = True
+    return candidate
+
+def load_state(release: str) -> dict:
+    with open(os.path.join(release, 'state.json'), 'r') as f:
+        return json.load(f)
+
+def next_version(releases_dir: str) -> int:
+    versions = [int(name[1:]) for name in os.listdir(releases_dir) if name.startswith('v') and name[1:].isdigit()]
+    return max(versions, default=0) + 1
+
+def publish(releases_dir: str, current_link: str, model: PipelineModel, crop_stats: dict, state: dict) -> str:
+    os.makedirs(releases_dir, exist_ok=True)
+    version = next_version(releases_dir)
+    release = os.path.join(releases_dir, f"v{version:04d}")
+    staging = f"{release}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    model.save(os.path.join(staging, 'model'))
+    export_pipeline_model(model, os.path.join(staging, 'spark_crop_recommender.npz'))
+    with open(os.path.join(staging, 'crop_stats.json'), 'w') as f:
+        json.dump(crop_stats, f, indent=4)
+    with open(os.path.join(staging, 'state.json'), 'w') as f:
+        json.dump({**state, 'version': version}, f, indent=4)
+    os.rename(staging, release)
+
+    # Readers resolve the link once per load, so they see either the old
+    # release or the new one in full.
+    link_tmp = f"{current_link}.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.abspath(release), link_tmp)
+    os.replace(link_tmp, current_link)
+
+    return release
+
+def prune_releases(releases_dir: str, current_link: str, keep: int):
+    current = os.path.realpath(current_link)
+    releases = sorted(name for name in os.listdir(releases_dir) if name.startswith('v') and name[1:].isdigit())
+    for name in releases[:-keep] if keep > 0 else []:
+        path = os.path.join(releases_dir, name)
+        if os.path.realpath(path) != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+def reload_api(url: str, current_link: str):
+    # Loading through the link lets the registry's file watcher pick up later
+    # releases on its own.
+    response = httpx.post(
+        f"{url.rstrip('/')}/admin/models/spark_crop/reload",
+        json={"path": os.path.join(os.path.abspath(current_link), 'spark_crop_recommender.npz')},
+        headers={"X-Admin-Token": os.getenv('ADMIN_TOKEN', '')},
+        timeout=60
+    )
+    print("Registry reload:", response.json())
+
+def run(args) -> dict:
+    started = time.perf_counter()
+    spark = get_spark()
+    spark.sparkContext.setLogLevel("ERROR")
+    report = {}
+
+    if os.path.exists(args.current):
+        previous_release = os.path.realpath(args.current)
+        state = load_state(previous_release)
+        model = PipelineModel.load(os.path.join(previous_release, 'model'))
+    else:
+        # First run: start from the model trained on the static CSV and
+        # seed the aggregates from the same file.
+        print(f"No current release at {args.current}, bootstrapping from {args.bootstrap_model} and {args.bootstrap_csv}")
+        state = {'watermark': None, 'aggregates': aggregate(read_training_csv(spark, args.bootstrap_csv))}
+        model = PipelineModel.load(args.bootstrap_model)
+
+    watermark = datetime.fromisoformat(state['watermark']) if state['watermark'] else datetime(1970, 1, 1)
+    cutoff = datetime.now() - timedelta(seconds=args.lag)
+    if cutoff <= watermark:
+        print(f"Nothing to do: watermark {watermark.isoformat()} is newer than the cutoff")
+        return {'skipped': True}
+
+    new_rows = read_new_rows(watermark, cutoff).cache()
+    new_aggregates = aggregate(new_rows)
+    report['new_rows'] = sum(agg['count'] for agg in new_aggregates.values())
+    report['window'] = [watermark.isoformat(), cutoff.isoformat()]
+
+    if report['new_rows'] >= args.min_rows:
+        model = warm_start(model, new_rows, args.max_iter, args.holdout, args.max_accuracy_drop, report)
+    else:
+        report['retrained'] = False
+        report['reason'] = f"fewer than {args.min_rows} new rows"
+    new_rows.unpersist()
+
+    aggregates = merge_aggregates(state['aggregates'], new_aggregates)
+    release = publish(
+        args.releases,
+        args.current,
+        model,
+        crop_stats_from(aggregates),
+        {'watermark': cutoff.isoformat(), 'aggregates': aggregates}
+    )
+    prune_releases(args.releases, args.current, args.keep)
+
+    report['release'] = release
+    report['seconds'] = time.perf_counter() - started
+    print(json.dumps(report, indent=4))
+
+    if args.reload_url:
+        reload_api(args.reload_url, args.current)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold new crops_table rows into crop_stats and warm-start the Spark crop model")
+    parser.add_argument('--releases', default=RELEASES_DIR)
+    parser.add_argument('--current', default=CURRENT_LINK, help="Symlink pointing at the live release")
+    parser.add_argument('--bootstrap-model', default=os.getenv('SPARK_CROP_MODEL_PATH', 'spark_crop_recommender'))
+    parser.add_argument('--bootstrap-csv', default='src/data/indiancrop_dataset.csv')
+    parser.add_argument('--lag', type=float, default=WATERMARK_LAG_SECONDS, help="Seconds to stay behind the newest rows")
+    parser.add_argument('--min-rows', type=int, default=100, help="New rows needed before retraining the model")
+    parser.add_argument('--max-iter', type=int, default=50)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02)
+    parser.add_argument('--keep', type=int, default=RELEASES_KEEP, help="Releases to keep on disk")
+    parser.add_argument('--reload-url', default=None, help="API base URL whose registry should load the new release")
+    args = parser.parse_args()
+
+    os.makedirs(args.releases, exist_ok=True)
+    with open(os.path.join(args.releases, '.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("Another retraining run holds the lock, exiting")
+            return
+        run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import json
+import numpy as np
+
+
+class LocalCropScorer:
+    def __init__(self, feature_names, mean, std, with_mean, with_std, weights, biases, labels, crop_stats=None):
+        self.feature_names = list(feature_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.with_mean = bool(with_mean)
+        self.with_std = bool(with_std)
+        self.weights = [np.asarray(w, dtype=np.float64) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float64) for b in biases]
+        self.labels = list(labels)
+        self.crop_stats = crop_stats or {}
+
+        self.inv_std = np.divide(1.0, self.std, out=np.zeros_like(self.std), where=self.std != 0)
+
+    @classmethod
+    def load(cls, artifact_path, crop_stats_path=None):
+        with np.load(artifact_path, allow_pickle=False) as artifact:
+            num_layers = int(artifact['num_layers'])
+            scorer = cls(
+                feature_names=artifact['feature_names'].tolist(),
+                mean=artifact['mean'],
+                std=artifact['std'],
+                with_mean=artifact['with_mean'],
+                with_std=artifact['with_std'],
+                weights=[artifact[f'weights_{i}'] for i in range(num_layers)],
+                biases=[artifact[f'biases_{i}'] for i in range(num_layers)],
+                labels=artifact['labels'].tolist()
+            )
+
+        if crop_stats_path:
+            with open(crop_stats_path, 'r') as f:
+                scorer.crop_stats = json.load(f)
+
+        return scorer
+
+    def save(self, artifact_path):
+        arrays = {
+            'feature_names': np.array(self.feature_names),
+            'mean': self.mean,
+            'std': self.std,
+            'with_mean': np.array(self.with_mean),
+            'with_std': np.array(self.with_std),
+            'labels': np.array(self.labels),
+            'num_layers': np.array(len(self.weights))
+        }
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f'weights_{i}'] = w
+            arrays[f'biases_{i}'] = b
+
+        with open(artifact_path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    def predict_proba(self, features):
+        x = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if self.with_mean:
+            x = x - self.mean
+        if self.with_std:
+            x = x * self.inv_std
+
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            x = x @ w + b
+            if i < last:
+                x = 1.0 / (1.0 + np.exp(-x))
+
+        x = np.exp(x - x.max(axis=1, keepdims=True))
+        return x / x.sum(axis=1, keepdims=True)
+
+    def predict(self, latitude, longitude, temperature, humidity, rainfall):
+        prob_scores = self.predict_proba([[latitude, longitude, temperature, humidity, rainfall]])[0]
+
+        recommendations = []
+        top_3_indices = (-prob_scores).argsort()[:3]
+
+        for idx in top_3_indices:
+            crop_name = self.labels[int(idx)]
+            confidence = float(prob_scores[int(idx)]) * 100
+
+            avg_params = self.crop_stats[crop_name]['avg_params']
+            avg_price = self.crop_stats[crop_name]['avg_price']
+
+            recommendations.append({
+                'crop': crop_name,
+                'confidence': confidence,
+                'soil_requirements': {
+                    'N': round(float(avg_params[0]), 2),
+                    'P': round(float(avg_params[1]), 2),
+                    'K': round(float(avg_params[2]), 2),
+                    'pH': round(float(avg_params[3]), 2)
+                },
+                'estimated_price': round(float(avg_price), 2)
+            })
+
+        return recommendations
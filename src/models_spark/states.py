@@ -0,0 +1,33 @@
+STATE_COORDINATES = {
+    'Andaman and Nicobar': (10.7449, 92.5000),
+    'Andhra Pradesh': (15.9129, 79.7400),
+    'Assam': (26.2006, 92.9376),
+    'Chattisgarh': (21.2787, 81.8661),
+    'Goa': (15.2993, 74.1240),
+    'Gujarat': (22.6708, 71.5724),
+    'Haryana': (29.0588, 76.0856),
+    'Himachal Pradesh': (32.1024, 77.5619),
+    'Jammu and Kashmir': (33.2778, 75.3412),
+    'Karnataka': (15.3173, 75.7139),
+    'Kerala': (10.1632, 76.6413),
+    'Madhya Pradesh': (22.9734, 78.6569),
+    'Maharashtra': (19.7515, 75.7139),
+    'Manipur': (24.6637, 93.9063),
+    'Meghalaya': (25.4670, 91.3662),
+    'Nagaland': (26.1584, 94.5624),
+    'Odisha': (20.2376, 84.2700),
+    'Pondicherry': (11.9416, 79.8083),
+    'Punjab': (31.1471, 75.3412),
+    'Rajasthan': (27.0238, 74.2179),
+    'Tamil Nadu': (11.1271, 78.6569),
+    'Telangana': (18.1124, 79.0193),
+    'Tripura': (23.5639, 91.6761),
+    'Uttar Pradesh': (27.5706, 80.0982),
+    'Uttrakhand': (29.2163, 79.0108),
+    'West Bengal': (22.9868, 87.8550)
+}
+
+def state_bbox(margin: float = 0.0) -> tuple:
+    lats = [lat for lat, _ in STATE_COORDINATES.values()]
+    lons = [lon for _, lon in STATE_COORDINATES.values()]
+    return (min(lats) - margin, min(lons) - margin, max(lats) + margin, max(lons) + margin)
@@ -1,31 +1,30 @@
+import asyncio
+import json
 import random
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from starlette.requests import Request
-from utils.crops import predict_crop_yield, predict_crop_yield_spark
-from utils.owa import convert_kelvin_to_celsius, get_complete_weather
-from utils.wind import WeatherData, predict_power_wind
-from utils.solar import SolarPowerInput, predict_power_solar
-from utils.airq import predict_aqi, IncomingData
-from models_spark.crop_yield import SparkCropRecommender
-from pyspark.sql import SparkSession
-from services.spark_hive import insert_into_crops
-from services.schema import CropSchema
-
-spark = SparkSession.builder \
-    .appName("CropRecommendation") \
-    .config("spark.driver.host", "localhost") \
-    .config("spark.driver.bindAddress", "localhost") \
-    .config("spark.executor.memory", "1g") \
-    .config("spark.driver.memory", "1g") \
-    .master("local[*]") \
-    .getOrCreate()
-    
-spark.sparkContext.setLogLevel("ERROR")
-
-recommender = SparkCropRecommender(spark)
-model_path = "spark_crop_recommender"
-recommender.load_model(model_path)
+from utils.crops import crop_cache, enrich_recommendations, recommend_crop_yield, recommend_crop_yield_spark, spark_crop_cache
+from utils.enrichment_jobs import enrichment_jobs
+from utils.forecast import MAX_FORECAST_HOURS, forecast_power
+from utils.executors import executor
+from utils.grid import grid_reader
+from utils.metrics import METRICS_CONTENT_TYPE, render_metrics
+from utils.owa import convert_kelvin_to_celsius, get_cached_forecast, get_cached_weather
+from utils.wind import WeatherData, predict_power_wind_batch, wind_cache, wind_input_from_weather, with_timestamp
+from utils.solar import SolarPowerInput, predict_power_solar_batch, solar_cache, solar_input_from_weather
+from utils.airq import IncomingData, airq_cache, predict_aqi_batch, airq_input_from_weather
+from utils.airq import generate_required_fields
+from utils.registry import get_spark_crop_scorer
+from utils.tracing import span
+from services.spark_client import (
+    insert_into_aqi, insert_into_crops, insert_into_solar, insert_into_wind,
+    remote_crop_recommender, spark_service
+)
+from services.schema import AQISchema, CropSchema, SolarSchema, WindSchema
 
 router = APIRouter()
 
@@ -33,43 +32,125 @@ router = APIRouter()
 async def health():
     return { "status": "ok" }
 
+@router.get("/metrics")
+async def metrics():
+    return Response(await executor.run_io(render_metrics), media_type=METRICS_CONTENT_TYPE)
+
+def new_id() -> int:
+    return random.randint(1, 1000) + random.randint(1, 1000)
+
+def insert_crop_result(body: dict, data: dict, result: list):
+    top = result[0]
+    insert_crop = CropSchema(
+        id=new_id(),
+        lat=float(body['lat']),
+        lon=float(body['lon']),
+        crop=top['crop'],
+        N=float(top['soil_requirements']['N']),
+        P=float(top['soil_requirements']['P']),
+        K=float(top['soil_requirements']['K']),
+        pH=float(top['soil_requirements']['pH']),
+        rainfall=data['total_precipitation_sfc'],
+        temperature=convert_kelvin_to_celsius(data['temperature_2_m_above_gnd']),
+        humidity=data['relative_humidity_2_m_above_gnd'],
+        price=float(top['estimated_price']),
+        pests=top['pests'],
+        diseases=top['diseases']
+    )
+
+    inserted = insert_into_crops(insert_crop)
+    if inserted is not True:
+        raise Exception(inserted['error'])
+
+def insert_power_result(body: dict, data: dict, solar_data, wind_data, pred_solar: dict, pred_wind: dict):
+    insert_into_solar(SolarSchema(
+        id=new_id(),
+        lat=float(body['lat']),
+        lon=float(body['lon']),
+        power=pred_solar['predicted_power_kw'],
+        dewpoint_2m=data['dewpoint_2m'],
+        **solar_data.dict()
+    ))
+    insert_into_wind(WindSchema(
+        id=new_id(),
+        lat=float(body['lat']),
+        lon=float(body['lon']),
+        power=pred_wind['predicted_power'],
+        **{**wind_data.dict(), "timestamp": pred_wind['timestamp']}
+    ))
+
+def insert_aqi_result(body: dict, airq_data, pred_aqi: int):
+    insert_into_aqi(AQISchema(
+        id=new_id(),
+        lat=float(body['lat']),
+        lon=float(body['lon']),
+        aqi=pred_aqi,
+        **generate_required_fields(airq_data).dict()
+    ))
+
+def on_cpu(fn, endpoint: str):
+    return lambda rows: executor.run_cpu(fn, rows, endpoint=endpoint)
+
+async def run_spark_crop_recommender(*args):
+    try:
+        get_spark_crop_scorer()
+    except Exception:
+        return await executor.run_io(recommend_crop_yield_spark, *args, recommender=remote_crop_recommender, endpoint="crops_info_spark")
+
+    return await executor.run_cpu(recommend_crop_yield_spark, *args, endpoint="crops_info_spark")
+
+async def recommend_spark_cached(*args):
+    return await spark_crop_cache.run_one(
+        args,
+        lambda rows: asyncio.gather(*(run_spark_crop_recommender(*row) for row in rows))
+    )
+
+async def recommend_cached(endpoint: str, *args):
+    return await crop_cache.run_one(
+        args,
+        lambda rows: asyncio.gather(*(executor.run_cpu(recommend_crop_yield, *row, endpoint=endpoint) for row in rows))
+    )
+
+async def run_crop_recommendations(endpoint: str, *args):
+    crops_rec = await recommend_cached(endpoint, *args)
+    return await executor.run_io(enrich_recommendations, crops_rec, endpoint="gemini")
+
+async def run_prediction(endpoint: str, cache, fn, build, data: dict, finish=None):
+    with span("features", model=cache.name):
+        row = build(data)
+    result = await cache.run_one(row, on_cpu(fn, endpoint))
+    return finish(row, result) if finish else result
+
 @router.post("/crops_info_spark")
 async def crops(request: Request):
     try:
         body = await request.json()
-        data = get_complete_weather(body['lat'], body['lon'])
+        data = await get_cached_weather(body['lat'], body['lon'])
         
-        result = predict_crop_yield_spark(
+        crops_rec = await recommend_spark_cached(
             body['lat'], 
             body['lon'], 
             convert_kelvin_to_celsius(data['temperature_2_m_above_gnd']), 
             data['relative_humidity_2_m_above_gnd'], 
-            data['total_precipitation_sfc'],
-            recommender=recommender
+            data['total_precipitation_sfc']
         )
         
+        if crops_rec and body.get('defer'):
+            cached = await executor.run_io(enrichment_jobs.lookup, crops_rec)
+            job = enrichment_jobs.submit(
+                crops_rec,
+                cached,
+                on_complete=lambda result: insert_crop_result(body, data, result)
+            )
+            return enrichment_jobs.describe(job)
+        
+        result = await executor.run_io(enrich_recommendations, crops_rec, endpoint="gemini")
+        
         if isinstance(result, dict) and "error" in result:
             return result
-        
-        insert_crop = CropSchema(
-            id=random.randint(1, 1000) + random.randint(1, 1000),
-            lat=float(body['lat']),
-            lon=float(body['lon']),
-            crop=result['crop'],
-            N=float(result['N']),
-            P=float(result['P']),
-            K=float(result['K']),
-            pH=result['pH'],
-            rainfall=data['total_precipitation_sfc'],
-            temperature=convert_kelvin_to_celsius(data['temperature_2_m_above_gnd']),
-            humidity=data['relative_humidity_2_m_above_gnd'],
-            price=result['price'],
-            pests=result['pests'],
-            diseases=result['diseases']
-        )
 
         try:
-            insert_into_crops(spark, insert_crop)
+            await executor.run_io(insert_crop_result, body, data, result, endpoint="hive")
         except Exception as e:
             return {"error": f"Error inserting to table: {str(e)}"}
 
@@ -84,9 +165,10 @@ async def crops(request: Request):
 async def crops(request: Request):
     try:
         body = await request.json()
-        data = get_complete_weather(body['lat'], body['lon'])
+        data = await get_cached_weather(body['lat'], body['lon'])
         
-        result = predict_crop_yield(
+        crops_rec = await recommend_cached(
+            "crops_info",
             body['lat'], 
             body['lon'], 
             convert_kelvin_to_celsius(data['temperature_2_m_above_gnd']), 
@@ -94,6 +176,13 @@ async def crops(request: Request):
             data['total_precipitation_sfc']
         )
         
+        if crops_rec and body.get('defer'):
+            cached = await executor.run_io(enrichment_jobs.lookup, crops_rec)
+            job = enrichment_jobs.submit(crops_rec, cached)
+            return enrichment_jobs.describe(job)
+        
+        result = await executor.run_io(enrich_recommendations, crops_rec, endpoint="gemini")
+        
         if isinstance(result, dict) and "error" in result:
             return result
 
@@ -103,48 +192,118 @@ async def crops(request: Request):
         
     except Exception as e:
         return {"error": f"API error: {str(e)}"}
+
+@router.get("/enrichment/{job_id}")
+async def enrichment(job_id: str):
+    job = enrichment_jobs.get(job_id)
+    if job is None:
+        return {"error": f"Unknown enrichment job '{job_id}'"}
+
+    return enrichment_jobs.describe(job)
+
+@router.get("/enrichment/{job_id}/stream")
+async def enrichment_stream(job_id: str):
+    job = enrichment_jobs.get(job_id)
+    if job is None:
+        return {"error": f"Unknown enrichment job '{job_id}'"}
+
+    async def events():
+        future = asyncio.wrap_future(job.future)
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=15)
+            if done:
+                future.exception()
+                break
+            yield ": keep-alive\n\n"
+
+        yield f"event: enrichment\ndata: {json.dumps(enrichment_jobs.describe(job))}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
     
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+# A page is sorted and held on the Spark service before its first chunk is
+# sent, so the cap bounds the service's memory as well as the response.
+MAX_HISTORY_PAGE = 100_000
+
+def parse_bbox(value: str) -> list:
+    try:
+        bbox = [float(v) for v in value.split(",")]
+    except ValueError:
+        bbox = []
+    if len(bbox) != 4:
+        raise Exception("bbox must be four numbers: min_lat,min_lon,max_lat,max_lon")
+    return bbox
+
+@router.get("/history/{kind}")
+async def history(
+    kind: str,
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bbox: Optional[str] = None,
+    crop: Optional[str] = None,
+    columns: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 10000,
+    batch_size: int = 5000
+):
+    fmt = "arrow" if ARROW_STREAM in request.headers.get("accept", "") else "ndjson"
+    try:
+        params = {
+            "start": start,
+            "end": end,
+            "bbox": parse_bbox(bbox) if bbox else None,
+            "crop": crop,
+            "columns": columns.split(",") if columns else None,
+            "cursor": cursor,
+            "limit": max(1, min(limit, MAX_HISTORY_PAGE))
+        }
+        page, chunks = await executor.run_io(spark_service.history, kind, params, fmt, batch_size, endpoint="history")
+    except Exception as e:
+        return {"error": f"API error: {str(e)}"}
+
+    headers = {"X-Row-Count": str(page['rows'])}
+    if page.get('next_cursor'):
+        headers["X-Next-Cursor"] = page['next_cursor']
+
+    media_type = ARROW_STREAM if fmt == "arrow" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@router.get("/grid/point")
+async def grid_point(lat: float, lon: float):
+    try:
+        return grid_reader.point(lat, lon)
+    except Exception as e:
+        return {"error": f"Grid error: {str(e)}"}
+
+@router.get("/grid/tile")
+async def grid_tile(bbox: str, layers: Optional[str] = None, stride: int = 1):
+    try:
+        return grid_reader.tile(
+            [float(v) for v in bbox.split(",")],
+            layers.split(",") if layers else None,
+            max(1, stride)
+        )
+    except Exception as e:
+        return {"error": f"Grid error: {str(e)}"}
+
 @router.post("/power")
-async def power(request: Request):
+async def power(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
-    data = get_complete_weather(body['lat'], body['lon'])
+    data = await get_cached_weather(body['lat'], body['lon'])
     
     try:
-        solar_data = SolarPowerInput(
-            temperature_2_m_above_gnd=data['temperature_2_m_above_gnd'],
-            relative_humidity_2_m_above_gnd=data['relative_humidity_2_m_above_gnd'],
-            mean_sea_level_pressure_MSL=data['mean_sea_level_pressure_MSL'],
-            total_precipitation_sfc=data['total_precipitation_sfc'],
-            snowfall_amount_sfc=data['snowfall_amount_sfc'],
-            total_cloud_cover_sfc=data['total_cloud_cover_sfc'],
-            high_cloud_cover_high_cld_lay=data['high_cloud_cover_high_cld_lay'],
-            medium_cloud_cover_mid_cld_lay=data['medium_cloud_cover_mid_cld_lay'],
-            low_cloud_cover_low_cld_lay=data['low_cloud_cover_low_cld_lay'],
-            shortwave_radiation_backwards_sfc=data['shortwave_radiation_backwards_sfc'],
-            wind_speed_10_m_above_gnd=data['wind_speed_10_m_above_gnd'],
-            wind_direction_10_m_above_gnd=data['wind_direction_10_m_above_gnd'],
-            wind_speed_80_m_above_gnd=data['wind_speed_80_m_above_gnd'],
-            wind_direction_80_m_above_gnd=data['wind_direction_80_m_above_gnd'],
-            wind_speed_900_mb=data['wind_speed_900_mb'],
-            wind_direction_900_mb=data['wind_direction_900_mb'],
-            wind_gust_10_m_above_gnd=data['wind_gust_10_m_above_gnd'],
-            angle_of_incidence=data['angle_of_incidence'],
-            zenith=data['zenith'],
-            azimuth=data['azimuth']         
-        )
+        with span("features"):
+            solar_data = solar_input_from_weather(data)
+            wind_data = wind_input_from_weather(data)
         
-        wind_data = WeatherData(
-            temperature_2_m_above_gnd=data['temperature_2_m_above_gnd'],
-            relative_humidity_2_m_above_gnd=data['relative_humidity_2_m_above_gnd'],
-            dewpoint_2m=data['dewpoint_2m'],
-            wind_speed_10_m_above_gnd=data['wind_speed_10_m_above_gnd'],
-            windspeed_100m=data['wind_speed_80_m_above_gnd'],
-            wind_direction_10_m_above_gnd=data['wind_direction_10_m_above_gnd'],
-            winddirection_100m=data['wind_direction_80_m_above_gnd'],
-            wind_gust_10_m_above_gnd=data['wind_gust_10_m_above_gnd'],
+        pred_solar, pred_wind = await asyncio.gather(
+            solar_cache.run_one(solar_data, on_cpu(predict_power_solar_batch, "power")),
+            wind_cache.run_one(wind_data, on_cpu(predict_power_wind_batch, "power"))
         )
-        pred_solar = await predict_power_solar(solar_data)
-        pred_wind = await predict_power_wind(wind_data)
+        pred_wind = with_timestamp(wind_data, pred_wind)
+        
+        background_tasks.add_task(executor.run_io, insert_power_result, body, data, solar_data, wind_data, pred_solar, pred_wind, endpoint="hive")
         
         return {
             "solar": pred_solar,
@@ -154,22 +313,31 @@ async def power(request: Request):
         return {"error": f"API error: {str(e)}"}
         
 
+@router.post("/forecast")
+async def forecast(request: Request):
+    try:
+        body = await request.json()
+        hours = float(body.get('hours', 48))
+        if not 0 < hours <= MAX_FORECAST_HOURS:
+            return {"error": f"hours must be greater than 0 and at most {MAX_FORECAST_HOURS}"}
+        data = await get_cached_forecast(body['lat'], body['lon'])
+
+        return await executor.run_cpu(forecast_power, data, hours, endpoint="forecast")
+    except Exception as e:
+        return {"error": f"API error: {str(e)}"}
+
 @router.post("/air_quality")
-async def aqi(request: Request):
+async def aqi(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
-    data = get_complete_weather(body['lat'], body['lon'])
+    data = await get_cached_weather(body['lat'], body['lon'])
     
     try:
-        airq_data = IncomingData(
-            humidity=data['relative_humidity_2_m_above_gnd'],
-            wind_speed=data['wind_speed_10_m_above_gnd'],
-            wind_direction=data['wind_direction_10_m_above_gnd'],
-            dew_point=data['dewpoint_2m'],
-            temperature=data['temperature_2_m_above_gnd'],
-            clouds_all=data['total_cloud_cover_sfc']
-        )
+        with span("features"):
+            airq_data = airq_input_from_weather(data)
+        
+        pred_aqi = await airq_cache.run_one(airq_data, on_cpu(predict_aqi_batch, "air_quality"))
         
-        pred_aqi = predict_aqi(airq_data)
+        background_tasks.add_task(executor.run_io, insert_aqi_result, body, airq_data, pred_aqi, endpoint="hive")
     
         return {
             "aqi": pred_aqi,
@@ -178,5 +346,109 @@ async def aqi(request: Request):
         
     except Exception as e:
         return {"error": f"API error: {str(e)}"}
+
+async def fetch_weather_many(locations: list) -> list:
+    return await asyncio.gather(
+        *(get_cached_weather(location['lat'], location['lon']) for location in locations),
+        return_exceptions=True
+    )
+
+def scatter_results(weather: list, results: list) -> list:
+    results = iter(results)
+    return [
+        {"error": f"Weather error: {str(item)}"} if isinstance(item, Exception) else next(results)
+        for item in weather
+    ]
+
+@router.post("/power/batch")
+async def power_batch(request: Request):
+    try:
+        body = await request.json()
+        
+        if 'locations' in body:
+            weather = await fetch_weather_many(body['locations'])
+            fetched = [item for item in weather if not isinstance(item, Exception)]
+            with span("features", rows=len(fetched)):
+                solar_rows = [solar_input_from_weather(item) for item in fetched]
+                wind_rows = [wind_input_from_weather(item) for item in fetched]
+        else:
+            weather = None
+            solar_rows = [SolarPowerInput(**row) for row in body.get('solar', [])]
+            wind_rows = [WeatherData(**row) for row in body.get('wind', [])]
+        
+        pred_solar, pred_wind = await asyncio.gather(
+            solar_cache.run(solar_rows, on_cpu(predict_power_solar_batch, "power_batch")),
+            wind_cache.run(wind_rows, on_cpu(predict_power_wind_batch, "power_batch"))
+        )
+        now = datetime.now()
+        pred_wind = [with_timestamp(row, result, now) for row, result in zip(wind_rows, pred_wind)]
+        
+        if weather is not None:
+            pred_solar = scatter_results(weather, pred_solar)
+            pred_wind = scatter_results(weather, pred_wind)
         
-    
\ No newline at end of file
+        return {
+            "solar": pred_solar,
+            "wind": pred_wind
+        }
+    except Exception as e:
+        return {"error": f"API error: {str(e)}"}
+
+@router.post("/air_quality/batch")
+async def aqi_batch(request: Request):
+    try:
+        body = await request.json()
+        
+        if 'locations' in body:
+            weather = await fetch_weather_many(body['locations'])
+            with span("features"):
+                rows = [airq_input_from_weather(item) for item in weather if not isinstance(item, Exception)]
+        else:
+            weather = None
+            rows = [IncomingData(**row) for row in body.get('rows', [])]
+        
+        pred_aqi = await airq_cache.run(rows, on_cpu(predict_aqi_batch, "air_quality_batch"))
+        
+        if weather is not None:
+            pred_aqi = scatter_results(weather, pred_aqi)
+        
+        return {
+            "aqi": pred_aqi,
+            "status": "ok"
+        }
+    except Exception as e:
+        return {"error": f"API error: {str(e)}"}
+
+@router.post("/dashboard")
+async def dashboard(request: Request):
+    try:
+        body = await request.json()
+        data = await get_cached_weather(body['lat'], body['lon'])
+    except Exception as e:
+        return {"error": f"API error: {str(e)}"}
+
+    temperature = convert_kelvin_to_celsius(data['temperature_2_m_above_gnd'])
+
+    tasks = {
+        "solar": run_prediction("dashboard", solar_cache, predict_power_solar_batch, solar_input_from_weather, data),
+        "wind": run_prediction("dashboard", wind_cache, predict_power_wind_batch, wind_input_from_weather, data, with_timestamp),
+        "aqi": run_prediction("dashboard", airq_cache, predict_aqi_batch, airq_input_from_weather, data),
+        "crops": run_crop_recommendations(
+            "dashboard",
+            body['lat'],
+            body['lon'],
+            temperature,
+            data['relative_humidity_2_m_above_gnd'],
+            data['total_precipitation_sfc']
+        )
+    }
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    response = {}
+    for name, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            response[name] = {"error": f"Prediction error: {str(result)}"}
+        else:
+            response[name] = result
+
+    return response
@@ -0,0 +1,157 @@
+import argparse
+import json
+import math
+import uuid
+from collections import defaultdict
+from urllib.parse import unquote
+from .spark_client import spark_service
+from .spark_hive import get_spark
+
+spark = get_spark()
+
+TABLES = [
+    "test_db.crops_table",
+    "test_db.aqi_table",
+    "test_db.solar_table",
+    "test_db.wind_table"
+]
+
+def _hadoop():
+    jvm = spark._jvm
+    return jvm.org.apache.hadoop.fs.Path, spark._jsc.hadoopConfiguration()
+
+def table_location(table: str) -> str:
+    rows = spark.sql(f"DESCRIBE FORMATTED {table}").collect()
+    for row in rows:
+        if row['col_name'].strip() == 'Location':
+            return row['data_type'].strip()
+    raise Exception(f"Could not find location for {table}")
+
+def _is_hidden(relative_path: str) -> bool:
+    return any(part.startswith(('_', '.')) for part in relative_path.split('/') if part)
+
+def list_data_files(location: str) -> dict:
+    Path, conf = _hadoop()
+    root = Path(location)
+    fs = root.getFileSystem(conf)
+    root_uri = fs.makeQualified(root).toString().rstrip('/')
+
+    files = defaultdict(list)
+    iterator = fs.listFiles(root, True)
+    while iterator.hasNext():
+        status = iterator.next()
+        path = status.getPath().toString()
+        relative = path[len(root_uri):].lstrip('/')
+        if _is_hidden(relative):
+            continue
+        directory = relative.rsplit('/', 1)[0] if '/' in relative else ''
+        files[directory].append((path, status.getLen()))
+    return files
+
+def summarize(files: dict) -> dict:
+    return {
+        "files": sum(len(entries) for entries in files.values()),
+        "bytes": sum(size for entries in files.values() for _, size in entries)
+    }
+
+def partition_clause(directory: str) -> str:
+    # "prediction_date=2024-01-01/geo_cell=12_77" -> PARTITION (prediction_date='2024-01-01', geo_cell='12_77')
+    if not directory:
+        return ""
+    values = [part.split('=', 1) for part in directory.split('/')]
+    return "PARTITION (" + ", ".join(f"{name}='{unquote(value)}'" for name, value in values) + ")"
+
+def data_columns(table: str) -> list:
+    return [column.name for column in spark.catalog.listColumns(table) if not column.isPartition]
+
+def compact_directory(table: str, location: str, directory: str, entries: list, target_file_bytes: int, dry_run: bool = False) -> dict:
+    total_bytes = sum(size for _, size in entries)
+    target_files = max(1, math.ceil(total_bytes / target_file_bytes))
+    result = {
+        "partition": directory or None,
+        "files_before": len(entries),
+        "bytes_before": total_bytes,
+        "files_after": len(entries),
+        "compacted": False
+    }
+    if len(entries) <= target_files or dry_run:
+        if len(entries) > target_files:
+            result["files_after"] = target_files
+        return result
+
+    Path, conf = _hadoop()
+    fs = Path(location).getFileSystem(conf)
+    # Staged next to the table rather than inside it: overwriting an
+    # unpartitioned table clears its whole location.
+    staging_dir = f"{location.rstrip('/')}_compaction_{uuid.uuid4().hex}"
+    view = f"compaction_{uuid.uuid4().hex}"
+
+    # Appends are held back in the Spark service for the whole rewrite, and
+    # the partition is replaced by a single INSERT OVERWRITE instead of file
+    # renames, so readers never see old and compacted rows side by side and
+    # a failure cannot leave both behind.
+    try:
+        with spark_service.writes_paused() as pause:
+            live_entries = list_data_files(location).get(directory, entries)
+            spark.read.parquet(*[path for path, _ in live_entries]) \
+                .repartition(target_files) \
+                .write.mode("overwrite").parquet(staging_dir)
+
+            spark.read.parquet(staging_dir).createOrReplaceTempView(view)
+            columns = ", ".join(f"`{name}`" for name in data_columns(table))
+            # Rows flushed after the pause lapsed are not in the staging copy
+            # and would be overwritten, so leave the partition as it is.
+            try:
+                pause.check()
+            except Exception as e:
+                print(f"Skipping {table} {directory or '(table)'}: {str(e)}")
+                result["error"] = str(e)
+                return result
+            spark.sql(f"INSERT OVERWRITE TABLE {table} {partition_clause(directory)} SELECT {columns} FROM {view}")
+    finally:
+        spark.catalog.dropTempView(view)
+        fs.delete(Path(staging_dir), True)
+
+    new_files = list_data_files(location).get(directory, [])
+    result["files_after"] = len(new_files)
+    result["compacted"] = True
+    return result
+
+def compact_table(table: str, target_file_bytes: int = 128 * 1024 * 1024, dry_run: bool = False) -> dict:
+    location = table_location(table)
+    files = list_data_files(location)
+    before = summarize(files)
+
+    partitions = [
+        compact_directory(table, location, directory, entries, target_file_bytes, dry_run)
+        for directory, entries in sorted(files.items())
+    ]
+
+    if not dry_run:
+        spark.sql(f"REFRESH TABLE {table}")
+    after = before if dry_run else summarize(list_data_files(location))
+
+    return {
+        "table": table,
+        "dry_run": dry_run,
+        "files_before": before["files"],
+        "bytes_before": before["bytes"],
+        "files_after": sum(p["files_after"] for p in partitions) if dry_run else after["files"],
+        "bytes_after": after["bytes"],
+        "partitions_compacted": sum(1 for p in partitions if p["compacted"]),
+        "partitions": partitions
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact small Parquet files in the test_db tables")
+    parser.add_argument('--table', action='append', help="Table to compact (defaults to all test_db tables)")
+    parser.add_argument('--target-mb', type=int, default=128)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    for table in args.table or TABLES:
+        report = compact_table(table, args.target_mb * 1024 * 1024, args.dry_run)
+        print(json.dumps({k: v for k, v in report.items() if k != "partitions"}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import base64
+import io
+import json
+from datetime import datetime
+import pyarrow as pa
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, count, lit, max as max_, struct
+from pyspark.sql.types import (
+    ArrayType, BooleanType, DateType, DoubleType, FloatType, IntegerType,
+    LongType, StringType, StructType, TimestampType
+)
+from .spark_hive import read_from_crops, read_from_aqi, read_from_solar, read_from_wind
+
+HISTORY_READERS = {
+    "crops": read_from_crops,
+    "aqi": read_from_aqi,
+    "solar": read_from_solar,
+    "wind": read_from_wind
+}
+CURSOR_COLUMNS = ["prediction_ts", "id"]
+
+def encode_cursor(prediction_ts: datetime, row_id: int) -> str:
+    payload = json.dumps([prediction_ts.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str):
+    prediction_ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(prediction_ts), int(row_id)
+
+def to_arrow_type(data_type):
+    if isinstance(data_type, IntegerType):
+        return pa.int32()
+    if isinstance(data_type, LongType):
+        return pa.int64()
+    if isinstance(data_type, DoubleType):
+        return pa.float64()
+    if isinstance(data_type, FloatType):
+        return pa.float32()
+    if isinstance(data_type, BooleanType):
+        return pa.bool_()
+    if isinstance(data_type, StringType):
+        return pa.string()
+    if isinstance(data_type, TimestampType):
+        return pa.timestamp('us')
+    if isinstance(data_type, DateType):
+        return pa.date32()
+    if isinstance(data_type, ArrayType):
+        return pa.list_(to_arrow_type(data_type.elementType))
+    if isinstance(data_type, StructType):
+        return pa.struct([pa.field(f.name, to_arrow_type(f.dataType)) for f in data_type.fields])
+    raise TypeError(f"Unsupported column type {data_type}")
+
+def to_arrow_schema(schema: StructType) -> pa.Schema:
+    return pa.schema([pa.field(f.name, to_arrow_type(f.dataType)) for f in schema.fields])
+
+class HistoryPage:
+    def __init__(self, kind, start=None, end=None, bbox=None, crop=None, columns=None, cursor=None, limit=10000):
+        if kind not in HISTORY_READERS:
+            raise Exception(f"Unknown history table '{kind}'")
+
+        filters = {"start": start, "end": end, "bbox": bbox}
+        if kind == "crops":
+            filters["crop"] = crop
+        df = HISTORY_READERS[kind](**filters)
+
+        if cursor:
+            cursor_ts, cursor_id = decode_cursor(cursor)
+            df = df.filter(
+                (col("prediction_ts") > lit(cursor_ts)) |
+                ((col("prediction_ts") == lit(cursor_ts)) & (col("id") > cursor_id))
+            )
+
+        if columns:
+            df = df.select(*dict.fromkeys(list(columns) + CURSOR_COLUMNS))
+
+        self.limit = limit
+        self.df = df.orderBy(*CURSOR_COLUMNS).limit(limit).persist(StorageLevel.MEMORY_AND_DISK)
+        self.schema = to_arrow_schema(self.df.schema)
+
+        summary = self.df.select(count(lit(1)).alias("rows"), max_(struct(*CURSOR_COLUMNS)).alias("last")).first()
+        self.rows = summary["rows"]
+        last = summary["last"]
+        self.next_cursor = encode_cursor(last["prediction_ts"], last["id"]) if last and self.rows >= limit else None
+
+    def chunks(self, batch_size=5000):
+        try:
+            rows = []
+            for row in self.df.toLocalIterator(prefetchPartitions=True):
+                rows.append(row.asDict(recursive=True))
+                if len(rows) >= batch_size:
+                    yield rows
+                    rows = []
+            if rows:
+                yield rows
+        finally:
+            self.df.unpersist()
+
+    def batches(self, batch_size=5000):
+        for rows in self.chunks(batch_size):
+            yield pa.RecordBatch.from_pylist(rows, schema=self.schema)
+
+    def iter_ndjson(self, batch_size=5000):
+        for rows in self.chunks(batch_size):
+            yield ("\n".join(json.dumps(row, default=str) for row in rows) + "\n").encode()
+
+    def iter_arrow(self, batch_size=5000):
+        sink = io.BytesIO()
+        writer = pa.ipc.new_stream(sink, self.schema)
+
+        def drain():
+            data = sink.getvalue()
+            sink.seek(0)
+            sink.truncate(0)
+            return data
+
+        yield drain()
+        for batch in self.batches(batch_size):
+            writer.write_batch(batch)
+            yield drain()
+        writer.close()
+        yield drain()
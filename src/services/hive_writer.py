@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class HiveWriteBuffer:
+    def __init__(
+        self,
+        write_fn: Callable[[str, List[dict]], None],
+        max_rows: int = 500,
+        max_age: float = 5.0,
+        max_pending: int = 10000,
+        max_retries: int = 5,
+        dead_letter_path: str = "hive_dead_letter.jsonl"
+    ):
+        self.write_fn = write_fn
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.metrics = {
+            "offered_rows": 0,
+            "rejected_rows": 0,
+            "written_rows": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "dead_letter_rows": 0,
+            "last_flush_seconds": 0.0,
+            "last_error": None
+        }
+        self._buffers: Dict[str, List[dict]] = defaultdict(list)
+        self._first_at: Dict[str, float] = {}
+        # Batches that failed to write: (table, rows, attempts, failed_at).
+        # Each is retried on its own so one bad row cannot hold back the rows
+        # buffered after it.
+        self._retries: List[Tuple[str, List[dict], int, float]] = []
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._paused_until = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name="hive-writer", daemon=True)
+            self._thread.start()
+
+    def offer(self, table: str, row: dict, timeout: Optional[float] = 0) -> bool:
+        with self._cond:
+            if self._closed:
+                raise Exception("Hive write buffer is closed")
+
+            deadline = time.monotonic() + timeout if timeout else None
+            while self._pending >= self.max_pending:
+                remaining = deadline - time.monotonic() if deadline else 0
+                if remaining <= 0:
+                    self.metrics["rejected_rows"] += 1
+                    return False
+                self._cond.wait(remaining)
+
+            self._buffers[table].append(row)
+            self._first_at.setdefault(table, time.monotonic())
+            self._pending += 1
+            self.metrics["offered_rows"] += 1
+
+            if len(self._buffers[table]) >= self.max_rows:
+                self._cond.notify_all()
+
+        self.start()
+        return True
+
+    def _take_due(self, force: bool = False) -> List[Tuple[str, List[dict], int]]:
+        now = time.monotonic()
+        due = []
+        waiting = []
+        for table, rows, attempts, failed_at in self._retries:
+            if force or now - failed_at >= self.max_age * attempts:
+                due.append((table, rows, attempts))
+            else:
+                waiting.append((table, rows, attempts, failed_at))
+        self._retries = waiting
+
+        for table, rows in self._buffers.items():
+            if rows and (force or len(rows) >= self.max_rows or now - self._first_at[table] >= self.max_age):
+                due.append((table, rows, 0))
+                self._buffers[table] = []
+                self._first_at.pop(table, None)
+        return due
+
+    def _write(self, due: List[Tuple[str, List[dict], int]]):
+        for table, rows, attempts in due:
+            started = time.perf_counter()
+            try:
+                self.write_fn(table, rows)
+            except Exception as e:
+                attempts += 1
+                self.metrics["failed_flushes"] += 1
+                self.metrics["last_error"] = f"{table}: {str(e)}"
+                if attempts < self.max_retries:
+                    print(f"Hive flush to {table} failed ({attempts}/{self.max_retries}), retrying {len(rows)} rows: {str(e)}")
+                    with self._cond:
+                        self._retries.append((table, rows, attempts, time.monotonic()))
+                    continue
+
+                print(f"Hive flush to {table} failed {attempts} times, moving {len(rows)} rows to {self.dead_letter_path}: {str(e)}")
+                self._dead_letter(table, rows, str(e))
+                with self._cond:
+                    self._pending -= len(rows)
+                    self.metrics["dead_letter_rows"] += len(rows)
+                    self._cond.notify_all()
+                continue
+
+            with self._cond:
+                self._pending -= len(rows)
+                self.metrics["written_rows"] += len(rows)
+                self.metrics["flushes"] += 1
+                self.metrics["last_flush_seconds"] = time.perf_counter() - started
+                self._cond.notify_all()
+
+    def _dead_letter(self, table: str, rows: List[dict], error: str):
+        with open(self.dead_letter_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps({"table": table, "error": error, "row": row}, default=str) + "\n")
+
+    def _is_paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait(timeout=min(self.max_age, 1.0))
+                if self._is_paused():
+                    continue
+                due = self._take_due()
+
+            if due:
+                with self._flush_lock:
+                    self._write(due)
+
+    def flush(self, ignore_pause: bool = False):
+        with self._flush_lock:
+            with self._cond:
+                if self._is_paused() and not ignore_pause:
+                    return
+                due = self._take_due(force=True)
+            self._write(due)
+
+    def pause(self, seconds: float):
+        # Stops flushing for at most `seconds`, so a maintenance job that
+        # dies without resuming cannot hold writes back for good. Taking the
+        # flush lock first waits out a flush that is already running.
+        with self._flush_lock:
+            with self._cond:
+                self._paused_until = time.monotonic() + seconds
+
+    def resume(self):
+        with self._cond:
+            self._paused_until = 0.0
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush(ignore_pause=True)
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self.metrics,
+                "pending_rows": self._pending,
+                "pending_by_table": {table: len(rows) for table, rows in self._buffers.items() if rows},
+                "retrying_rows": sum(len(rows) for _, rows, _, _ in self._retries),
+                "max_pending": self.max_pending,
+                "paused": self._is_paused()
+            }
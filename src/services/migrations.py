@@ -0,0 +1,66 @@
+import argparse
+from pyspark.sql.functions import col, lit, to_date
+from .compaction import TABLES, table_location
+from .spark_client import spark_service
+from .spark_hive import get_spark, create_db_and_tables, geo_cell_expr
+
+spark = get_spark()
+
+PARTITION_COLUMNS = ["prediction_date", "geo_cell"]
+
+def is_partitioned(table: str) -> bool:
+    return any(column.isPartition for column in spark.catalog.listColumns(table))
+
+def legacy_name(table: str) -> str:
+    return f"{table}_legacy"
+
+def migrate_table(table: str, drop_legacy: bool = False) -> dict:
+    if not spark.catalog.tableExists(table):
+        return {"table": table, "status": "missing"}
+    if is_partitioned(table):
+        return {"table": table, "status": "already partitioned"}
+
+    legacy = legacy_name(table)
+
+    # Hold the service's buffered appends while the table is swapped, so
+    # none land in the legacy table after its rows have been read.
+    with spark_service.writes_paused():
+        spark.sql(f"ALTER TABLE {table} RENAME TO {legacy}")
+        create_db_and_tables()
+
+    location = table_location(legacy)
+
+    # The legacy rows carry no timestamp, so each row is stamped with the
+    # modification time of the Parquet file it was appended in.
+    legacy_df = spark.read.parquet(location) \
+        .withColumn("prediction_ts", col("_metadata.file_modification_time"))
+
+    target_schema = spark.table(table).schema
+    for field in target_schema:
+        if field.name not in legacy_df.columns and field.name not in PARTITION_COLUMNS:
+            legacy_df = legacy_df.withColumn(field.name, lit(None))
+
+    migrated = legacy_df \
+        .withColumn("prediction_date", to_date(col("prediction_ts"))) \
+        .withColumn("geo_cell", geo_cell_expr()) \
+        .select(*[col(field.name).cast(field.dataType) for field in target_schema])
+
+    migrated.write.insertInto(table)
+    rows = spark.table(table).count()
+
+    if drop_legacy:
+        spark.sql(f"DROP TABLE {legacy}")
+
+    return {"table": table, "status": "migrated", "rows": rows, "legacy_table": None if drop_legacy else legacy}
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the test_db tables to the partitioned layout")
+    parser.add_argument('--table', action='append', help="Table to migrate (defaults to all test_db tables)")
+    parser.add_argument('--drop-legacy', action='store_true')
+    args = parser.parse_args()
+
+    for table in args.table or TABLES:
+        print(migrate_table(table, args.drop_legacy))
+
+if __name__ == "__main__":
+    main()
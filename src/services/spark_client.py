@@ -0,0 +1,244 @@
+import fcntl
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+from .spark_protocol import SOCKET_PATH, recv_frame, recv_json, rows_to_arrow, send_frame, send_json
+from .schema import AQISchema, CropSchema, SolarSchema, WindSchema
+from utils.metrics import stage
+from utils.tracing import set_attributes, trace_context
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SparkServiceClient:
+    def __init__(
+        self,
+        socket_path: str = SOCKET_PATH,
+        autostart: bool = os.getenv('SPARK_SERVICE_AUTOSTART', '1') == '1',
+        start_timeout: float = float(os.getenv('SPARK_SERVICE_START_TIMEOUT', '120')),
+        timeout: float = float(os.getenv('SPARK_SERVICE_TIMEOUT', '60'))
+    ):
+        self.socket_path = socket_path
+        self.autostart = autostart
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def is_alive(self) -> bool:
+        try:
+            with self._connect() as sock:
+                send_json(sock, {"op": "ping"})
+                return recv_json(sock).get("ok", False)
+        except OSError:
+            return False
+
+    def ensure_started(self):
+        if self.is_alive():
+            return
+        if not self.autostart:
+            raise Exception(f"Spark service is not running on {self.socket_path}")
+
+        # Only one API worker spawns the service; the others wait on the lock
+        # and find it running once they get through.
+        with open(f"{self.socket_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.is_alive():
+                    return
+
+                env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SRC_DIR, os.getenv('PYTHONPATH')]))}
+                subprocess.Popen(
+                    [sys.executable, "-m", "services.spark_worker", "--socket", self.socket_path],
+                    env=env,
+                    start_new_session=True
+                )
+
+                deadline = time.monotonic() + self.start_timeout
+                while time.monotonic() < deadline:
+                    if self.is_alive():
+                        return
+                    time.sleep(0.5)
+                raise Exception("Timed out waiting for the Spark service to start")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _open(self, op: str, args: dict = None, payload: bytes = None) -> socket.socket:
+        try:
+            sock = self._connect()
+        except OSError:
+            self.ensure_started()
+            sock = self._connect()
+
+        send_json(sock, {"op": op, "args": args or {}, "trace": trace_context()})
+        if payload is not None:
+            send_frame(sock, payload)
+        return sock
+
+    def call(self, op: str, args: dict = None, payload: bytes = None) -> dict:
+        with stage(f"spark.{op}"):
+            with self._open(op, args, payload) as sock:
+                response = recv_json(sock)
+            if not response.get("ok"):
+                raise Exception(response.get("error", "Spark service error"))
+            if "spark_jobs" in response:
+                set_attributes(spark_jobs=response["spark_jobs"])
+        return response
+
+    def stream(self, op: str, args: dict = None):
+        with stage(f"spark.{op}"):
+            sock = self._open(op, args)
+            try:
+                response = recv_json(sock)
+            except Exception:
+                sock.close()
+                raise
+            if not response.get("ok"):
+                sock.close()
+                raise Exception(response.get("error", "Spark service error"))
+            set_attributes(spark_jobs=response.get("spark_jobs", []), rows=response.get("rows"))
+
+        def chunks():
+            # Only an empty frame ends the stream; a connection closed before
+            # it means the service failed partway and must not look complete.
+            try:
+                while True:
+                    try:
+                        chunk = recv_frame(sock)
+                    except ConnectionError:
+                        raise Exception(f"Spark service aborted the {op} stream")
+                    if not chunk:
+                        return
+                    yield chunk
+            finally:
+                sock.close()
+
+        return response, chunks()
+
+    def metrics(self) -> dict:
+        # Scrapes must not spawn the service, so only ask a running one.
+        if not self.is_alive():
+            return {}
+        return self.stats()
+
+    def ping(self) -> dict:
+        return self.call("ping")
+
+    def insert(self, table: str, rows: list) -> dict:
+        return self.call("insert", {"table": table}, rows_to_arrow(rows))
+
+    def stats(self) -> dict:
+        return self.call("stats")
+
+    def flush(self) -> dict:
+        return self.call("flush")
+
+    @contextmanager
+    def writes_paused(self, lease: float = 60):
+        # Holds the service's Hive write buffer for maintenance jobs. The
+        # pause is a lease renewed while the block runs, so a job that dies
+        # releases it within `lease` seconds. A service that is not running
+        # has nothing buffered to hold back. Call check() on the yielded
+        # lease right before a step that relies on the pause still holding.
+        pause = PauseLease(lease)
+        if not self.is_alive():
+            yield pause
+            return
+
+        self.call("pause", {"seconds": lease})
+        pause.renewed()
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(lease / 3):
+                try:
+                    self.call("pause", {"seconds": lease})
+                except Exception as e:
+                    pause.error = e
+                    return
+                pause.renewed()
+
+        renewer = threading.Thread(target=renew, name="hive-pause-lease", daemon=True)
+        renewer.start()
+        try:
+            yield pause
+        finally:
+            done.set()
+            renewer.join()
+            try:
+                self.call("resume")
+            except Exception as e:
+                print(f"Failed to resume Hive writes, the pause runs out on its own: {str(e)}")
+
+    def history(self, kind: str, params: dict, format: str = "ndjson", batch_size: int = 5000):
+        return self.stream("history", {"kind": kind, "params": params, "format": format, "batch_size": batch_size})
+
+    def predict_crop(self, **features) -> list:
+        return self.call("predict_crop", features)["recommendations"]
+
+
+class PauseLease:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.error: Optional[Exception] = None
+        self._renewed_at = None
+
+    def renewed(self):
+        self._renewed_at = time.monotonic()
+
+    def check(self):
+        if self.error is not None:
+            raise Exception(f"Lost the Hive write pause: {str(self.error)}")
+        if self._renewed_at is not None and time.monotonic() - self._renewed_at >= self.seconds:
+            raise Exception("Lost the Hive write pause: the lease ran out")
+
+
+class RemoteSparkCropRecommender:
+    def __init__(self, client: SparkServiceClient):
+        self.client = client
+
+    def predict(self, latitude, longitude, temperature, humidity, rainfall):
+        return self.client.predict_crop(
+            latitude=latitude,
+            longitude=longitude,
+            temperature=temperature,
+            humidity=humidity,
+            rainfall=rainfall
+        )
+
+
+spark_service = SparkServiceClient()
+remote_crop_recommender = RemoteSparkCropRecommender(spark_service)
+
+def insert_row(table: str, data):
+    with stage(f"hive.insert.{table.split('.')[-1]}"):
+        response = spark_service.insert(table, [{**data.dict(), "prediction_ts": datetime.now()}])
+    if response["accepted"]:
+        return True
+    return {"error": f"Write buffer for {table} is full"}
+
+def insert_into_crops(data: CropSchema):
+    return insert_row("test_db.crops_table", data)
+
+def insert_into_aqi(data: AQISchema):
+    return insert_row("test_db.aqi_table", data)
+
+def insert_into_solar(data: SolarSchema):
+    return insert_row("test_db.solar_table", data)
+
+def insert_into_wind(data: WindSchema):
+    return insert_row("test_db.wind_table", data)
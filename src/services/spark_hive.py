@@ -1,13 +1,86 @@
+import math
+import os
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime
 from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, concat_ws, floor
+from .hive_writer import HiveWriteBuffer
 from .schema import CropSchema, WindSchema, AQISchema, SolarSchema
 
-spark = SparkSession.builder \
-    .appName("Python Spark SQL basic example") \
-    .config("hive.metastore.uris", "thrift://localhost:9083") \
-    .enableHiveSupport() \
-    .getOrCreate()
+_spark = None
+
+def get_spark() -> SparkSession:
+    global _spark
+    if _spark is None:
+        _spark = SparkSession.builder \
+            .appName("Python Spark SQL basic example") \
+            .config("hive.metastore.uris", "thrift://localhost:9083") \
+            .config("hive.exec.dynamic.partition", "true") \
+            .config("hive.exec.dynamic.partition.mode", "nonstrict") \
+            .enableHiveSupport() \
+            .getOrCreate()
+    return _spark
+
+spark_job_counts = Counter()
+_job_counts_lock = threading.Lock()
+
+@contextmanager
+def track_jobs(op: str, description: str = None):
+    # Tag every Spark job started from this thread with a group unique to
+    # this operation, then count what ran under it once the work is done.
+    sc = get_spark().sparkContext
+    group = f"{op}-{uuid.uuid4().hex}"
+    sc.setJobGroup(group, description or op)
+    jobs = []
+    try:
+        yield jobs
+    finally:
+        jobs.extend(sc.statusTracker().getJobIdsForGroup(group))
+        sc.setLocalProperty("spark.jobGroup.id", None)
+        sc.setLocalProperty("spark.job.description", None)
+        with _job_counts_lock:
+            spark_job_counts[op] += len(jobs)
+
+def spark_job_stats() -> dict:
+    with _job_counts_lock:
+        counts = dict(spark_job_counts)
+    return {
+        "jobs": counts,
+        "active_jobs": len(get_spark().sparkContext.statusTracker().getActiveJobsIds())
+    }
+
+GEO_CELL_DEGREES = 1.0
+MAX_PRUNED_CELLS = 400
+
+def geo_cell(lat: float, lon: float) -> str:
+    return f"{math.floor(lat / GEO_CELL_DEGREES)}_{math.floor(lon / GEO_CELL_DEGREES)}"
+
+def geo_cell_expr(lat_col="lat", lon_col="lon"):
+    return concat_ws(
+        "_",
+        floor(col(lat_col) / GEO_CELL_DEGREES).cast("string"),
+        floor(col(lon_col) / GEO_CELL_DEGREES).cast("string")
+    )
+
+def geo_cells_in_bbox(bbox) -> list:
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat_range = range(math.floor(min_lat / GEO_CELL_DEGREES), math.floor(max_lat / GEO_CELL_DEGREES) + 1)
+    lon_range = range(math.floor(min_lon / GEO_CELL_DEGREES), math.floor(max_lon / GEO_CELL_DEGREES) + 1)
+    return [f"{lat_idx}_{lon_idx}" for lat_idx in lat_range for lon_idx in lon_range]
+
+def partition_values(lat: float, lon: float, ts: datetime = None) -> dict:
+    ts = ts or datetime.now()
+    return {
+        "prediction_ts": ts,
+        "prediction_date": ts.date(),
+        "geo_cell": geo_cell(lat, lon)
+    }
 
 def create_db_and_tables():    
+    spark = get_spark()
     databases = spark.sql("show databases")
     databases.show()
 
@@ -28,8 +101,10 @@ def create_db_and_tables():
         humidity DOUBLE,
         price DOUBLE,
         pests ARRAY<STRUCT<name:STRING, description:STRING>>,
-        diseases ARRAY<STRUCT<name:STRING, description:STRING>>        
+        diseases ARRAY<STRUCT<name:STRING, description:STRING>>,
+        prediction_ts TIMESTAMP
         ) 
+        PARTITIONED BY (prediction_date DATE, geo_cell STRING)
         STORED AS PARQUET
     """)
     
@@ -48,8 +123,10 @@ def create_db_and_tables():
         rain_p_h DOUBLE,
         snow_p_h DOUBLE,
         traffic_volume DOUBLE,
-        aqi DOUBLE
+        aqi DOUBLE,
+        prediction_ts TIMESTAMP
         ) 
+        PARTITIONED BY (prediction_date DATE, geo_cell STRING)
         STORED AS PARQUET
     """)
 
@@ -79,8 +156,10 @@ def create_db_and_tables():
         wind_gust_10_m_above_gnd DOUBLE,
         angle_of_incidence DOUBLE,
         zenith DOUBLE,
-        azimuth DOUBLE
+        azimuth DOUBLE,
+        prediction_ts TIMESTAMP
         ) 
+        PARTITIONED BY (prediction_date DATE, geo_cell STRING)
         STORED AS PARQUET
     """)
     
@@ -97,63 +176,105 @@ def create_db_and_tables():
         windspeed_100m DOUBLE,
         wind_direction_10_m_above_gnd DOUBLE,
         winddirection_100m DOUBLE,
-        wind_gust_10_m_above_gnd DOUBLE
+        wind_gust_10_m_above_gnd DOUBLE,
+        timestamp STRING,
+        prediction_ts TIMESTAMP
         ) 
-        STORED AS PARQUET        
+        PARTITIONED BY (prediction_date DATE, geo_cell STRING)
+        STORED AS PARQUET
     """)
 
     spark.sql("SHOW TABLES IN test_db").show()
     
-def insert_into_crops(data: CropSchema):
-    df = spark.createDataFrame([data.dict()])
-    try:
-        df.write.mode("append").saveAsTable("test_db.crops_table")
+def write_rows(table: str, rows: list):
+    spark = get_spark()
+    with track_jobs("hive_write"):
+        df = spark.createDataFrame(rows, schema=spark.table(table).schema)
+        df.write.insertInto(table)
+
+hive_writer = HiveWriteBuffer(
+    write_rows,
+    max_rows=int(os.getenv('HIVE_FLUSH_ROWS', '500')),
+    max_age=float(os.getenv('HIVE_FLUSH_SECONDS', '5')),
+    max_pending=int(os.getenv('HIVE_MAX_PENDING_ROWS', '10000')),
+    max_retries=int(os.getenv('HIVE_MAX_RETRIES', '5')),
+    dead_letter_path=os.getenv('HIVE_DEAD_LETTER_PATH', 'hive_dead_letter.jsonl')
+)
+
+def insert_rows(table: str, rows: list) -> int:
+    accepted = 0
+    for row in rows:
+        row = {**row, **partition_values(row['lat'], row['lon'], row.get('prediction_ts'))}
+        if not hive_writer.offer(table, row):
+            break
+        accepted += 1
+    return accepted
+
+def insert_row(table: str, data):
+    if insert_rows(table, [data.dict()]):
         return True
-    except Exception as e:
-        return {"error": f"API error: {str(e)}"}
+    return {"error": f"Write buffer for {table} is full"}
+
+def insert_into_crops(data: CropSchema):
+    return insert_row("test_db.crops_table", data)
 
 def insert_into_aqi(data: AQISchema):
-    df = spark.createDataFrame([data.dict()])
-    try:
-        df.write.mode("append").saveAsTable("test_db.aqi_table")
-        return True
-    except Exception as e:
-        return {"error": f"API error: {str(e)}"}
+    return insert_row("test_db.aqi_table", data)
 
 def insert_into_solar(data: SolarSchema):
-    df = spark.createDataFrame([data.dict()])
-    try:
-        df.write.mode("append").saveAsTable("test_db.solar_table")
-        return True
-    except Exception as e:
-        return {"error": f"API error: {str(e)}"}
+    return insert_row("test_db.solar_table", data)
 
 def insert_into_wind(data: WindSchema):
-    df = spark.createDataFrame([data.dict()])
-    try:
-        df.write.mode("append").saveAsTable("test_db.wind_table")
-        return True
-    except Exception as e:
-        return {"error": f"API error: {str(e)}"}
+    return insert_row("test_db.wind_table", data)
 
-def read_from_crops():
-    df = spark.sql("SELECT * FROM test_db.crops_table")
-    return df
+def _to_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value)
 
-def read_from_aqi():
-    df = spark.sql("SELECT * FROM test_db.aqi_table")
-    return df
+def read_table(table: str, start=None, end=None, bbox=None, columns=None, filters=None):
+    df = get_spark().table(table)
 
-def read_from_solar():
-    df = spark.sql("SELECT * FROM test_db.solar_table")
-    return df
+    if start is not None:
+        start = _to_datetime(start)
+        df = df.filter(col("prediction_date") >= start.date()).filter(col("prediction_ts") >= start)
+    if end is not None:
+        end = _to_datetime(end)
+        df = df.filter(col("prediction_date") <= end.date()).filter(col("prediction_ts") < end)
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        cells = geo_cells_in_bbox(bbox)
+        if len(cells) <= MAX_PRUNED_CELLS:
+            df = df.filter(col("geo_cell").isin(cells))
+        df = df.filter(col("lat").between(min_lat, max_lat)).filter(col("lon").between(min_lon, max_lon))
+    for name, value in (filters or {}).items():
+        if value is not None:
+            df = df.filter(col(name) == value)
+    if columns:
+        df = df.select(*columns)
 
-def read_from_wind():
-    df = spark.sql("SELECT * FROM test_db.wind_table")
     return df
 
+def read_from_crops(start=None, end=None, bbox=None, crop=None, columns=None):
+    return read_table("test_db.crops_table", start, end, bbox, columns, {"crop": crop})
+
+def read_from_aqi(start=None, end=None, bbox=None, columns=None):
+    return read_table("test_db.aqi_table", start, end, bbox, columns)
+
+def read_from_solar(start=None, end=None, bbox=None, columns=None):
+    return read_table("test_db.solar_table", start, end, bbox, columns)
+
+def read_from_wind(start=None, end=None, bbox=None, columns=None):
+    return read_table("test_db.wind_table", start, end, bbox, columns)
+
 def close_spark():
-    spark.stop()
+    global _spark
+    hive_writer.close()
+    if _spark is not None:
+        _spark.stop()
+        _spark = None
     
 if __name__ == "__main__":
     read_from_crops()
\ No newline at end of file
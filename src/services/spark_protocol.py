@@ -0,0 +1,41 @@
+import json
+import os
+import socket
+import struct
+import pyarrow as pa
+
+SOCKET_PATH = os.getenv('SPARK_SERVICE_SOCKET', '/tmp/vaidya-spark.sock')
+_HEADER = struct.Struct('!I')
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Spark service closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size) if size else b""
+
+def send_json(sock: socket.socket, message: dict):
+    send_frame(sock, json.dumps(message, default=str).encode())
+
+def recv_json(sock: socket.socket) -> dict:
+    return json.loads(recv_frame(sock))
+
+def rows_to_arrow(rows: list) -> bytes:
+    batch = pa.RecordBatch.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def arrow_to_rows(payload: bytes) -> list:
+    return pa.ipc.open_stream(payload).read_all().to_pylist()
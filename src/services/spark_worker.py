@@ -0,0 +1,159 @@
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from .history import HistoryPage
+from .spark_hive import get_spark, create_db_and_tables, hive_writer, insert_rows, close_spark, spark_job_stats, track_jobs
+from .spark_protocol import SOCKET_PATH, arrow_to_rows, recv_frame, recv_json, send_frame, send_json
+
+started_at = time.time()
+_recommender = None
+_recommender_lock = threading.Lock()
+# Trace context sent by the API for the request this handler thread serves.
+_request = threading.local()
+
+def get_recommender():
+    global _recommender
+    with _recommender_lock:
+        if _recommender is None:
+            from models_spark.crop_yield import SparkCropRecommender
+            recommender = SparkCropRecommender(get_spark())
+            recommender.load_model(os.getenv('SPARK_CROP_MODEL_PATH', 'spark_crop_recommender'))
+            _recommender = recommender
+    return _recommender
+
+def job_description(op: str) -> str:
+    # Shows up next to the job in the Spark UI, so a slow job can be traced
+    # back to the API request that started it.
+    trace = getattr(_request, "trace", None)
+    if not trace:
+        return op
+    return f"{op} trace={trace['trace_id']} span={trace['span_id']}"
+
+def handle_ping(sock, args):
+    spark = get_spark()
+    send_json(sock, {
+        "ok": True,
+        "pid": os.getpid(),
+        "uptime": time.time() - started_at,
+        "app_id": spark.sparkContext.applicationId
+    })
+
+def handle_insert(sock, args):
+    rows = arrow_to_rows(recv_frame(sock))
+    accepted = insert_rows(args['table'], rows)
+    send_json(sock, {"ok": True, "accepted": accepted, "rejected": len(rows) - accepted})
+
+def handle_stats(sock, args):
+    send_json(sock, {"ok": True, "hive_writer": hive_writer.stats(), "spark": spark_job_stats()})
+
+def handle_flush(sock, args):
+    hive_writer.flush()
+    send_json(sock, {"ok": True, "hive_writer": hive_writer.stats()})
+
+def handle_pause(sock, args):
+    hive_writer.pause(float(args.get('seconds', 60)))
+    send_json(sock, {"ok": True, "hive_writer": hive_writer.stats()})
+
+def handle_resume(sock, args):
+    hive_writer.resume()
+    send_json(sock, {"ok": True, "hive_writer": hive_writer.stats()})
+
+def handle_history(sock, args):
+    with track_jobs("history", job_description("history")) as jobs:
+        page = HistoryPage(args['kind'], **args.get('params', {}))
+    send_json(sock, {"ok": True, "rows": page.rows, "next_cursor": page.next_cursor, "spark_jobs": jobs})
+
+    try:
+        with track_jobs("history", job_description("history")):
+            batch_size = args.get('batch_size', 5000)
+            chunks = page.iter_arrow(batch_size) if args.get('format') == 'arrow' else page.iter_ndjson(batch_size)
+            for chunk in chunks:
+                if chunk:
+                    send_frame(sock, chunk)
+            send_frame(sock, b"")
+    except ConnectionError:
+        raise
+    except Exception as e:
+        # The header already went out, so an error message would be read as
+        # another chunk. Closing without the empty terminator tells the client
+        # the stream is incomplete.
+        print(f"History stream failed after the header: {str(e)}")
+        sock.shutdown(socket.SHUT_RDWR)
+
+def handle_predict_crop(sock, args):
+    with track_jobs("predict_crop", job_description("predict_crop")) as jobs:
+        recommendations = get_recommender().predict(**args)
+    send_json(sock, {"ok": True, "recommendations": recommendations, "spark_jobs": jobs})
+
+HANDLERS = {
+    "ping": handle_ping,
+    "insert": handle_insert,
+    "stats": handle_stats,
+    "flush": handle_flush,
+    "pause": handle_pause,
+    "resume": handle_resume,
+    "history": handle_history,
+    "predict_crop": handle_predict_crop
+}
+
+class SparkServiceHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = recv_json(self.request)
+        except ConnectionError:
+            return
+
+        _request.trace = request.get('trace')
+        handler = HANDLERS.get(request.get('op'))
+        if handler is None:
+            send_json(self.request, {"ok": False, "error": f"Unknown op '{request.get('op')}'"})
+            return
+
+        try:
+            handler(self.request, request.get('args', {}))
+        except ConnectionError:
+            pass
+        except Exception as e:
+            try:
+                send_json(self.request, {"ok": False, "error": str(e)})
+            except OSError:
+                pass
+
+class SparkServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedicated Spark service for the API workers")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    args = parser.parse_args()
+
+    spark = get_spark()
+    spark.sparkContext.setLogLevel("ERROR")
+    create_db_and_tables()
+    hive_writer.start()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = SparkServiceServer(args.socket, SparkServiceHandler)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Spark service listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        close_spark()
+
+if __name__ == "__main__":
+    main()
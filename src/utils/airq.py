@@ -1,20 +1,8 @@
-import pickle
+from typing import ClassVar, Dict, List
 from pydantic import BaseModel
-
-model = None
-
-def load_model():
-    global model
-    if model is None:
-        try:
-            with open('air_pollution.pkl', 'rb') as file:
-                model = pickle.load(file)
-            return model
-        except FileNotFoundError:
-            raise Exception("Model file 'air_pollution.pkl' not found!")
-        except Exception as e:
-            raise Exception(f"Error loading model: {str(e)}")
-    return model
+from utils.metrics import timed
+from utils.prediction_cache import PredictionCache
+from utils.registry import get_airq_model
 
 class IncomingData(BaseModel):
     humidity: float
@@ -23,7 +11,27 @@ class IncomingData(BaseModel):
     dew_point: float
     temperature: float
     clouds_all: float
-    
+
+    tolerances: ClassVar[Dict[str, float]] = {
+        'humidity': 1,
+        'wind_speed': 0.1,
+        'wind_direction': 5,
+        'dew_point': 0.1,
+        'temperature': 0.1,
+        'clouds_all': 1,
+    }
+
+airq_cache = PredictionCache("airq", "airq", IncomingData.tolerances)
+
+def airq_input_from_weather(data: dict) -> IncomingData:
+    return IncomingData(
+        humidity=data['relative_humidity_2_m_above_gnd'],
+        wind_speed=data['wind_speed_10_m_above_gnd'],
+        wind_direction=data['wind_direction_10_m_above_gnd'],
+        dew_point=data['dewpoint_2m'],
+        temperature=data['temperature_2_m_above_gnd'],
+        clouds_all=data['total_cloud_cover_sfc']
+    )
 
 class AQI(BaseModel):
     humidity: float
@@ -66,28 +74,35 @@ def convert_api_to_aqi(api_value):
     
     return round(aqi_value)
     
-def predict_aqi(data: IncomingData):
+@timed("predict.airq")
+def predict_aqi_batch(rows: List[IncomingData]) -> List[int]:
+    if not rows:
+        return []
+
     try:
-        ml_model = load_model()
-        required_fields = generate_required_fields(data)
+        ml_model = get_airq_model().model
         
-        data_dict = required_fields.dict()
-        features = [
-            data_dict['humidity'],
-            data_dict['wind_speed'],
-            data_dict['wind_direction'],
-            data_dict['visibility_in_miles'],
-            data_dict['dew_point'],
-            data_dict['temperature'],
-            data_dict['rain_p_h'],
-            data_dict['snow_p_h'],
-            data_dict['clouds_all'],
-            data_dict['traffic_volume']
-        ]
+        features = []
+        for row in rows:
+            required_fields = generate_required_fields(row)
+            features.append([
+                required_fields.humidity,
+                required_fields.wind_speed,
+                required_fields.wind_direction,
+                required_fields.visibility_in_miles,
+                required_fields.dew_point,
+                required_fields.temperature,
+                required_fields.rain_p_h,
+                required_fields.snow_p_h,
+                required_fields.clouds_all,
+                required_fields.traffic_volume
+            ])
         
-        api_val = ml_model.predict([features])[0]
-        aqi_val = convert_api_to_aqi(api_val)
+        api_vals = ml_model.predict(features)
     
-        return aqi_val
+        return [convert_api_to_aqi(api_val) for api_val in api_vals]
     except Exception as e:
-        raise Exception(f"Prediction error: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Prediction error: {str(e)}")
+
+def predict_aqi(data: IncomingData):
+    return predict_aqi_batch([data])[0]
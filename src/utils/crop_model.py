@@ -1,3 +1,4 @@
+import os
 import torch
 import torch.nn as nn
 import numpy as np
@@ -99,3 +100,92 @@ class CropRecommender:
                 })
             
         return recommendations
+
+
+def configure_torch_threads(num_threads=None):
+    if num_threads is None:
+        workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+        # An empty TORCH_NUM_THREADS (as in .env.example) means "pick for me".
+        num_threads = int(os.getenv('TORCH_NUM_THREADS') or max(1, (os.cpu_count() or 1) // workers))
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    return num_threads
+
+class CropInferenceEngine:
+    def __init__(self, model, scaler, label_encoder, crop_stats, top_k=3):
+        self.top_k = top_k
+        self.input_size = model.network[0].in_features
+
+        model = model.to('cpu').eval()
+        with torch.no_grad():
+            traced = torch.jit.trace(model, torch.zeros(1, self.input_size))
+        self.module = torch.jit.freeze(traced)
+
+        self.mean = np.asarray(scaler.mean_, dtype=np.float32) if scaler.with_mean else None
+        self.scale = np.asarray(scaler.scale_, dtype=np.float32) if scaler.with_std else None
+
+        self.crops = [str(crop) for crop in label_encoder.classes_]
+        self.crop_table = []
+        for crop_name in self.crops:
+            stats = crop_stats.get(crop_name)
+            if stats is None:
+                self.crop_table.append(None)
+                continue
+            avg_params = stats['avg_params']
+            self.crop_table.append({
+                'soil_requirements': {
+                    'N': round(float(avg_params[0]), 2),
+                    'P': round(float(avg_params[1]), 2),
+                    'K': round(float(avg_params[2]), 2),
+                    'pH': round(float(avg_params[3]), 2)
+                },
+                'estimated_price': round(float(stats['avg_price']), 2)
+            })
+
+    @classmethod
+    def from_recommender(cls, recommender: CropRecommender, top_k=3):
+        return cls(
+            recommender.model,
+            recommender.scaler,
+            recommender.label_encoder,
+            recommender.crop_stats,
+            top_k=top_k
+        )
+
+    def predict_proba(self, features):
+        x = np.asarray(features, dtype=np.float32).reshape(-1, self.input_size)
+        if self.mean is not None:
+            x = x - self.mean
+        if self.scale is not None:
+            x = x / self.scale
+
+        with torch.inference_mode():
+            outputs = self.module(torch.from_numpy(x))
+            return torch.softmax(outputs, dim=1)
+
+    def recommend(self, features):
+        probabilities = self.predict_proba(features)
+        top_probs, top_indices = torch.topk(probabilities, k=self.top_k)
+
+        results = []
+        for probs, indices in zip(top_probs.tolist(), top_indices.tolist()):
+            recommendations = []
+            for idx, prob in zip(indices, probs):
+                entry = self.crop_table[idx]
+                if entry is None:
+                    continue
+                recommendations.append({
+                    'crop': self.crops[idx],
+                    'confidence': prob * 100,
+                    'soil_requirements': dict(entry['soil_requirements']),
+                    'estimated_price': entry['estimated_price']
+                })
+            results.append(recommendations)
+
+        return results
+
+    def predict(self, latitude, longitude, temperature, humidity, rainfall):
+        return self.recommend([[float(latitude), float(longitude), temperature, humidity, rainfall]])[0]
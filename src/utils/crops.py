@@ -1,69 +1,52 @@
 import json
-import torch 
-from utils.crop_model import CropRecommendationModel, CropRecommender
-from utils.gem import gen_pests_and_diseases
-import joblib
+from utils.gem import enrich_crops
+from utils.metrics import timed
+from utils.prediction_cache import PredictionCache
+from utils.registry import get_crop_model, get_spark_crop_scorer
 
-def load_model():
-    recommender = CropRecommender()
-    
-    recommender.model.load_state_dict(torch.load('crop_recommender.pt'))
-    recommender.model.eval()
-
-    recommender.scaler = joblib.load('scaler.pkl')
-    recommender.label_encoder = joblib.load('label_encoder.pkl')
-    
-    return recommender
+CROP_TOLERANCES = {
+    'lat': 0.01,
+    'lon': 0.01,
+    'temperature': 0.1,
+    'humidity': 1,
+    'rainfall': 0.1,
+}
 
-def predict_crop_yield(lat: str, lon: str, temp: float, humidity: float, rainfall: float):
-    recommender = load_model()
-    
-    if recommender.model and recommender.scaler and recommender.label_encoder:
-        print("Model, scaler, and label encoder loaded successfully.")
+def crop_cache_features(args: tuple) -> dict:
+    return dict(zip(CROP_TOLERANCES, map(float, args)))
 
-    recommender.load_crop_stats('crop_stats.txt')
+crop_cache = PredictionCache("crop", "crop", CROP_TOLERANCES, features=crop_cache_features)
+spark_crop_cache = PredictionCache("spark_crop", "spark_crop", CROP_TOLERANCES, features=crop_cache_features)
 
-    recommendations = recommender.predict(
-        latitude=lat,
-        longitude=lon,
-        temperature=temp,
-        humidity=humidity,
-        rainfall=rainfall
-    )
-    
-    if not recommendations:
-        print("No recommendations returned. Check model and input data.")
-        return
-    
-    print("\nCrop Recommendations:")
+def format_recommendations(recommendations):
     crops_rec = []
-    for i, rec in enumerate(recommendations, 1):
+    for rec in recommendations:
         new_crop = {
             'crop': rec['crop'],
             'confidence': rec['confidence'],
             'soil_requirements': rec['soil_requirements'],
-            'estimated_price': rec['estimated_price'] / 50,
+            'estimated_price': float(rec['estimated_price']) / 50,
         }
         crops_rec.append(new_crop)
+    return crops_rec
 
-    print("\nCrop Recommendations Predicted:", crops_rec)
-    
-    enhanced_data = gen_pests_and_diseases(json.dumps(crops_rec))
-    
-    try:
-        if isinstance(enhanced_data, str):
-            parsed_data = json.loads(enhanced_data)
-        else:
-            parsed_data = enhanced_data
-        return parsed_data 
-            
-    except json.JSONDecodeError:
-        return {"error": "Invalid JSON in enhanced data"}
-    except Exception as e:
-        return {"error": f"Processing error: {str(e)}"}
+@timed("predict.crop")
+def recommend_crop_yield(lat: str, lon: str, temp: float, humidity: float, rainfall: float):
+    engine = get_crop_model().engine
 
-def predict_crop_yield_spark(lat: str, lon: str, temp: float, humidity: float, rainfall: float, recommender):
+    recommendations = engine.predict(
+        latitude=lat,
+        longitude=lon,
+        temperature=temp,
+        humidity=humidity,
+        rainfall=rainfall
+    )
     
+    return format_recommendations(recommendations)
+
+@timed("predict.spark_crop")
+def recommend_crop_yield_spark(lat: str, lon: str, temp: float, humidity: float, rainfall: float, recommender=None):
+    recommender = recommender or get_spark_crop_scorer()
     recommendations = recommender.predict(
         latitude=float(lat),
         longitude=float(lon),
@@ -72,33 +55,23 @@ def predict_crop_yield_spark(lat: str, lon: str, temp: float, humidity: float, r
         rainfall=rainfall
     )
     
-    if not recommendations:
+    return format_recommendations(recommendations)
+
+def enrich_recommendations(crops_rec):
+    if not crops_rec:
         print("No recommendations returned. Check model and input data.")
         return
     
-    print("\nCrop Recommendations:")
-    crops_rec = []
-    for i, rec in enumerate(recommendations, 1):
-        new_crop = {
-            'crop': rec['crop'],
-            'confidence': rec['confidence'],
-            'soil_requirements': rec['soil_requirements'],
-            'estimated_price': float(rec['estimated_price']) / 50,
-        }
-        crops_rec.append(new_crop)
-
-    print("\nCrop Recommendations Predicted:", crops_rec)
-    
-    enhanced_data = gen_pests_and_diseases(json.dumps(crops_rec))
-    
     try:
-        if isinstance(enhanced_data, str):
-            parsed_data = json.loads(enhanced_data)
-        else:
-            parsed_data = enhanced_data
-        return parsed_data 
+        return enrich_crops(crops_rec)
             
     except json.JSONDecodeError:
         return {"error": "Invalid JSON in enhanced data"}
     except Exception as e:
-        return {"error": f"Processing error: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Processing error: {str(e)}"}
+
+def predict_crop_yield(lat: str, lon: str, temp: float, humidity: float, rainfall: float):
+    return enrich_recommendations(recommend_crop_yield(lat, lon, temp, humidity, rainfall))
+
+def predict_crop_yield_spark(lat: str, lon: str, temp: float, humidity: float, rainfall: float, recommender=None):
+    return enrich_recommendations(recommend_crop_yield_spark(lat, lon, temp, humidity, rainfall, recommender))
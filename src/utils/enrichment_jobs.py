@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.gem import fetch_enrichment, lookup_enrichment, merge_enrichment
+
+
+@dataclass
+class EnrichmentJob:
+    id: str
+    crops_rec: List[dict]
+    future: Future
+    created_at: float = field(default_factory=time.time)
+
+
+class EnrichmentJobs:
+    def __init__(self, max_concurrency: int, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self.deduplicated = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="enrichment")
+        self._jobs: "OrderedDict[str, EnrichmentJob]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, ...], Future] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, crops_rec: List[dict]) -> Dict[str, dict]:
+        # Reads the SQLite store, so callers on the event loop run this in the
+        # I/O pool and hand the result to submit().
+        return lookup_enrichment(sorted(set(rec['crop'] for rec in crops_rec)))
+
+    def submit(self, crops_rec: List[dict], cached: Dict[str, dict], on_complete: Optional[Callable[[List[dict]], None]] = None) -> EnrichmentJob:
+        crop_names = sorted(set(rec['crop'] for rec in crops_rec))
+        missing = tuple(crop for crop in crop_names if crop not in cached)
+
+        job = EnrichmentJob(id=uuid.uuid4().hex, crops_rec=crops_rec, future=Future())
+
+        if not missing:
+            job.future.set_result(merge_enrichment(crops_rec, cached))
+        else:
+            with self._lock:
+                upstream = self._inflight.get(missing)
+                if upstream is None:
+                    upstream = self._executor.submit(fetch_enrichment, list(missing))
+                    self._inflight[missing] = upstream
+                    upstream.add_done_callback(lambda _: self._forget(missing))
+                else:
+                    self.deduplicated += 1
+
+            def resolve(f: Future):
+                try:
+                    job.future.set_result(merge_enrichment(crops_rec, {**cached, **f.result()}))
+                except Exception as e:
+                    job.future.set_exception(e)
+
+            upstream.add_done_callback(resolve)
+
+        if on_complete is not None:
+            def notify(f: Future):
+                if f.exception() is None:
+                    on_complete(f.result())
+
+            job.future.add_done_callback(notify)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        return job
+
+    def _forget(self, key: Tuple[str, ...]):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get(self, job_id: str) -> Optional[EnrichmentJob]:
+        return self._jobs.get(job_id)
+
+    def describe(self, job: EnrichmentJob) -> dict:
+        if not job.future.done():
+            return {"enrichment_job": job.id, "status": "pending", "data": job.crops_rec}
+
+        error = job.future.exception()
+        if error is not None:
+            return {"enrichment_job": job.id, "status": "error", "error": f"Enrichment error: {str(error)}", "data": job.crops_rec}
+
+        return {"enrichment_job": job.id, "status": "done", "data": job.future.result()}
+
+    def stats(self):
+        return {
+            "jobs": len(self._jobs),
+            "inflight": len(self._inflight),
+            "deduplicated": self.deduplicated
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+enrichment_jobs = EnrichmentJobs(
+    max_concurrency=int(os.getenv('ENRICHMENT_MAX_CONCURRENCY', '4')),
+    max_jobs=int(os.getenv('ENRICHMENT_MAX_JOBS', '1000'))
+)
@@ -0,0 +1,75 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable
+
+
+class EnrichmentStore:
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS enrichment (
+            crop TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            pests TEXT NOT NULL,
+            diseases TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (crop, prompt_version)
+        )
+        """)
+        self._conn.commit()
+
+    def get_many(self, crops: Iterable[str], prompt_version: str) -> Dict[str, dict]:
+        crops = list(dict.fromkeys(crops))
+        if not crops:
+            return {}
+
+        placeholders = ",".join("?" for _ in crops)
+        min_created_at = time.time() - self.ttl
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT crop, pests, diseases FROM enrichment "
+                f"WHERE prompt_version = ? AND created_at >= ? AND crop IN ({placeholders})",
+                [prompt_version, min_created_at, *crops]
+            ).fetchall()
+
+        found = {
+            crop: {"pests": json.loads(pests), "diseases": json.loads(diseases)}
+            for crop, pests, diseases in rows
+        }
+        self.hits += len(found)
+        self.misses += len(crops) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, dict], prompt_version: str):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO enrichment (crop, prompt_version, pests, diseases, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (crop, prompt_version, json.dumps(entry.get('pests', [])), json.dumps(entry.get('diseases', [])), now)
+                    for crop, entry in entries.items()
+                ]
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM enrichment WHERE created_at < ?", [time.time() - self.ttl])
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict
+from utils.metrics import EXECUTOR_LATENCY, collect_stages, replay_stages
+from utils.profiler import profiled_call, profiler
+from utils.tracing import set_attributes, span
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, limit = item.split('=')
+        limits[name.strip()] = int(limit)
+    return limits
+
+def _init_cpu_worker(snapshot: Dict[str, dict]):
+    if not os.getenv('TORCH_NUM_THREADS'):
+        os.environ['TORCH_NUM_THREADS'] = '1'
+    from utils.registry import registry
+    registry.load_all(snapshot)
+
+class PoolStats:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.inflight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def snapshot(self):
+        return {
+            "max_workers": self.max_workers,
+            "inflight": self.inflight,
+            "queue_depth": max(0, self.inflight - self.max_workers),
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+class ExecutionLayer:
+    def __init__(self, io_workers: int, cpu_workers: int, endpoint_limits: Dict[str, int], default_limit: int):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.endpoint_limits = endpoint_limits
+        self.default_limit = default_limit
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self._cpu_pool = None
+        self._cpu_lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._endpoint_stats: Dict[str, dict] = {}
+        self.pool_stats = {
+            "io": PoolStats(io_workers),
+            "cpu": PoolStats(cpu_workers or io_workers)
+        }
+
+    @property
+    def cpu_pool(self):
+        if self.cpu_workers <= 0:
+            return self.io_pool
+        from utils.registry import registry
+        with self._cpu_lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context(os.getenv('CPU_POOL_START_METHOD', 'spawn')),
+                    initializer=_init_cpu_worker,
+                    initargs=(registry.snapshot(),)
+                )
+            return self._cpu_pool
+
+    def restart_cpu_pool(self, *_):
+        with self._cpu_lock:
+            old_pool, self._cpu_pool = self._cpu_pool, None
+        if old_pool is not None:
+            old_pool.shutdown(wait=False)
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            limit = self.endpoint_limits.get(endpoint, self.default_limit)
+            semaphore = self._semaphores[endpoint] = asyncio.Semaphore(limit)
+            self._endpoint_stats[endpoint] = {"limit": limit, "waiting": 0, "active": 0}
+        return semaphore
+
+    async def _run(self, kind: str, pool, call, endpoint: str = None):
+        stats = self.pool_stats[kind]
+        loop = asyncio.get_running_loop()
+
+        async def submit():
+            stats.inflight += 1
+            started = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(pool, call)
+            except Exception:
+                stats.failed += 1
+                raise
+            finally:
+                stats.inflight -= 1
+                EXECUTOR_LATENCY.labels(kind, endpoint or "").observe(time.perf_counter() - started)
+            stats.completed += 1
+            return result
+
+        if endpoint is None:
+            return await submit()
+
+        semaphore = self._semaphore(endpoint)
+        endpoint_stats = self._endpoint_stats[endpoint]
+        endpoint_stats["waiting"] += 1
+        waited = time.perf_counter()
+        async with semaphore:
+            endpoint_stats["waiting"] -= 1
+            set_attributes(wait_ms=(time.perf_counter() - waited) * 1000)
+            endpoint_stats["active"] += 1
+            try:
+                return await submit()
+            finally:
+                endpoint_stats["active"] -= 1
+
+    async def run_io(self, fn, *args, endpoint: str = None, **kwargs):
+        # The span is opened before copying the context so that spans started
+        # inside the worker thread nest under it.
+        with span("executor.io", endpoint=endpoint, fn=getattr(fn, "__name__", None)):
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, fn, *args, **kwargs)
+            if profiler.wants_profile():
+                call = functools.partial(profiler.run_marked, call)
+            return await self._run("io", self.io_pool, call, endpoint)
+
+    async def run_cpu(self, fn, *args, endpoint: str = None, **kwargs):
+        if self.cpu_workers <= 0:
+            return await self.run_io(fn, *args, endpoint=endpoint, **kwargs)
+        try:
+            # Context does not cross the process boundary, so work in the pool
+            # is only visible as this span. Stage timings recorded in the
+            # worker come back with the result and are recorded here.
+            with span("executor.cpu", endpoint=endpoint, fn=getattr(fn, "__name__", None)):
+                call = functools.partial(collect_stages, functools.partial(fn, *args, **kwargs))
+                try:
+                    if not profiler.wants_profile():
+                        result, stages = await self._run("cpu", self.cpu_pool, call, endpoint)
+                    else:
+                        session = profiler.session
+                        (result, stages), counts = await self._run("cpu", self.cpu_pool, functools.partial(profiled_call, session.interval, call), endpoint)
+                        profiler.merge(counts)
+                except Exception as e:
+                    replay_stages(getattr(e, "stages", []))
+                    raise
+                replay_stages(stages)
+                return result
+        except BrokenProcessPool:
+            self.restart_cpu_pool()
+            raise
+
+    def stats(self):
+        return {
+            "pools": {name: stats.snapshot() for name, stats in self.pool_stats.items()},
+            "endpoints": {name: dict(stats) for name, stats in self._endpoint_stats.items()}
+        }
+
+    def shutdown(self):
+        self.restart_cpu_pool()
+        self.io_pool.shutdown(wait=False)
+
+executor = ExecutionLayer(
+    io_workers=int(os.getenv('IO_POOL_SIZE', '32')),
+    cpu_workers=int(os.getenv('CPU_POOL_SIZE', str(max(1, (os.cpu_count() or 1) // 2)))),
+    endpoint_limits=_parse_limits(os.getenv('ENDPOINT_CONCURRENCY', '')),
+    default_limit=int(os.getenv('DEFAULT_ENDPOINT_CONCURRENCY', '64'))
+)
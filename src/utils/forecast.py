@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+from utils.owa import local_timestamps, transform_weather_batch
+from utils.solar import predict_power_solar_columns
+from utils.wind import predict_power_wind_columns, wind_columns_from_weather
+
+MAX_FORECAST_HOURS = 120
+
+def cumulative_energy(power: np.ndarray, step_hours: np.ndarray) -> np.ndarray:
+    increments = (power[1:] + power[:-1]) / 2 * step_hours
+    return np.concatenate([[0.0], np.cumsum(increments)])
+
+def forecast_power(forecast: Dict[str, Any], hours: float = 48) -> dict:
+    items = forecast.get('list', [])
+    if not items:
+        raise Exception("Forecast has no steps")
+
+    horizon = min(hours, MAX_FORECAST_HOURS) * 3600
+    items = [item for item in items if item['dt'] - items[0]['dt'] <= horizon]
+    timestamps = np.array([item['dt'] for item in items], dtype=np.int64)
+
+    features = transform_weather_batch(items, forecast.get('city', {}).get('coord'))
+    local = pd.DatetimeIndex(local_timestamps(timestamps).astype('datetime64[s]'))
+
+    solar = np.asarray(predict_power_solar_columns(features), dtype=np.float64)
+    wind = np.asarray(predict_power_wind_columns(wind_columns_from_weather(features), local), dtype=np.float64)
+
+    step_hours = np.diff(timestamps) / 3600
+    solar_energy = cumulative_energy(solar, step_hours)
+    wind_energy = cumulative_energy(wind, step_hours)
+
+    return {
+        "steps": [
+            {
+                "timestamp": datetime.fromtimestamp(int(ts)).isoformat(),
+                "solar_kw": float(solar[i]),
+                "wind": float(wind[i]),
+                "solar_energy_kwh": float(solar_energy[i]),
+                "wind_energy": float(wind_energy[i])
+            }
+            for i, ts in enumerate(timestamps)
+        ],
+        "hours": float(timestamps[-1] - timestamps[0]) / 3600,
+        "solar_energy_kwh": float(solar_energy[-1]),
+        "wind_energy": float(wind_energy[-1])
+    }
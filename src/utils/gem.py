@@ -1,11 +1,19 @@
+import hashlib
+import json
 import os
 import google.generativeai as genai
-from typing import List
+from typing import Dict, List
+from utils.enrichment_store import EnrichmentStore
+from utils.metrics import stage, timed
 
 gem_api_key = os.getenv('GEMINI_API_KEY')
+gem_api_endpoint = os.getenv('GEMINI_API_ENDPOINT')
 modelv = os.getenv('MODEL')
 
-genai.configure(api_key=gem_api_key)
+if gem_api_endpoint:
+    genai.configure(api_key=gem_api_key, transport="rest", client_options={"api_endpoint": gem_api_endpoint})
+else:
+    genai.configure(api_key=gem_api_key)
 
 model = genai.GenerativeModel(modelv)
 
@@ -13,16 +21,14 @@ prompt = """
 STRICT INSTRUCTIONS:
 1. Return ONLY valid JSON - no explanations, no markdown, no text
 2. The response must start with "[" and end with "]"
-3. Keep all existing fields from the input exactly as they are
-4. Add only these new fields to each crop object:
+3. Return exactly one object for every crop name given in the input list
+4. Each object must have only these fields:
+   - "crop": the crop name exactly as given in the input
    - "pests": array of {name, description} objects
    - "diseases": array of {name, description} objects
 5. Format: Exact match to this structure:
 {
-    "crop": <existing>,
-    "confidence": <existing>,
-    "soil_requirements": <existing>,
-    "estimated_price": <existing>,
+    "crop": <crop name>,
     "pests": [
         {
             "name": "Example Pest",
@@ -38,7 +44,63 @@ STRICT INSTRUCTIONS:
 }
 Give in Array of JSON format as mentioned above, dont give any text describing whats happening
 """
-def gen_pests_and_diseases(crops_rec):
-    res = model.generate_content(f"{prompt} {crops_rec}")
+prompt_version = hashlib.sha256(f"{modelv}:{prompt}".encode()).hexdigest()[:12]
 
-    return res.text
+enrichment_store = EnrichmentStore(
+    os.getenv('ENRICHMENT_DB_PATH', 'enrichment_cache.db'),
+    ttl=float(os.getenv('ENRICHMENT_TTL', str(30 * 24 * 3600)))
+)
+
+def parse_response(text: str):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[4:]
+    return json.loads(text)
+
+@timed("gemini.generate")
+def gen_pests_and_diseases(crop_names: List[str]) -> Dict[str, dict]:
+    res = model.generate_content(f"{prompt} {json.dumps(crop_names)}")
+    
+    with stage("gemini.parse"):
+        items = parse_response(res.text)
+
+    return {
+        item['crop']: {
+            "pests": item.get('pests', []),
+            "diseases": item.get('diseases', [])
+        }
+        for item in items
+    }
+
+def lookup_enrichment(crop_names: List[str]) -> Dict[str, dict]:
+    return enrichment_store.get_many(crop_names, prompt_version)
+
+def fetch_enrichment(crop_names: List[str]) -> Dict[str, dict]:
+    # The model does not always echo names back exactly, so key the results
+    # by the requested names and drop anything that was not asked for.
+    by_name = {crop.strip().lower(): value for crop, value in gen_pests_and_diseases(crop_names).items()}
+    fetched = {crop: by_name[crop.strip().lower()] for crop in crop_names if crop.strip().lower() in by_name}
+    enrichment_store.put_many(fetched, prompt_version)
+    return fetched
+
+def merge_enrichment(crops_rec: List[dict], enrichment: Dict[str, dict]) -> List[dict]:
+    return [
+        {
+            **rec,
+            "pests": enrichment.get(rec['crop'], {}).get('pests', []),
+            "diseases": enrichment.get(rec['crop'], {}).get('diseases', [])
+        }
+        for rec in crops_rec
+    ]
+
+def enrich_crops(crops_rec: List[dict]) -> List[dict]:
+    crop_names = list(dict.fromkeys(rec['crop'] for rec in crops_rec))
+    enrichment = lookup_enrichment(crop_names)
+    
+    missing = [crop for crop in crop_names if crop not in enrichment]
+    if missing:
+        enrichment.update(fetch_enrichment(missing))
+    
+    return merge_enrichment(crops_rec, enrichment)
@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+from models_spark.states import state_bbox
+from utils.airq import airq_input_from_weather, predict_aqi_batch
+from utils.owa import get_cached_weather, owa_client
+from utils.solar import predict_power_solar_batch, solar_input_from_weather
+from utils.wind import predict_power_wind_batch, wind_input_from_weather
+
+GRID_PATH = os.getenv('GRID_PATH', 'national_grid.bin')
+GRID_RESOLUTION = float(os.getenv('GRID_RESOLUTION', '1.0'))
+GRID_MARGIN = float(os.getenv('GRID_MARGIN', '1.0'))
+GRID_REFRESH_MINUTES = float(os.getenv('GRID_REFRESH_MINUTES', '0'))
+GRID_RELOAD_CHECK = float(os.getenv('GRID_RELOAD_CHECK', '1'))
+
+GRID_LAYERS = ("solar", "wind", "aqi")
+HEADER_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    min_lat: float
+    min_lon: float
+    resolution: float
+    n_lat: int
+    n_lon: int
+
+    @classmethod
+    def covering(cls, bbox, resolution: float) -> "GridSpec":
+        min_lat, min_lon, max_lat, max_lon = bbox
+        return cls(
+            min_lat=min_lat,
+            min_lon=min_lon,
+            resolution=resolution,
+            n_lat=max(2, math.ceil((max_lat - min_lat) / resolution) + 1),
+            n_lon=max(2, math.ceil((max_lon - min_lon) / resolution) + 1)
+        )
+
+    @property
+    def lats(self) -> np.ndarray:
+        return self.min_lat + self.resolution * np.arange(self.n_lat)
+
+    @property
+    def lons(self) -> np.ndarray:
+        return self.min_lon + self.resolution * np.arange(self.n_lon)
+
+    def nodes(self) -> list:
+        return [(float(lat), float(lon)) for lat in self.lats for lon in self.lons]
+
+def national_grid_spec(resolution: float = GRID_RESOLUTION) -> GridSpec:
+    return GridSpec.covering(state_bbox(GRID_MARGIN), resolution)
+
+async def score_grid(spec: GridSpec, run_cpu=None) -> np.ndarray:
+    nodes = spec.nodes()
+    weather = await asyncio.gather(
+        *(get_cached_weather(round(lat, 4), round(lon, 4)) for lat, lon in nodes),
+        return_exceptions=True
+    )
+    fetched = [i for i, item in enumerate(weather) if not isinstance(item, Exception)]
+    data = [weather[i] for i in fetched]
+    if not data:
+        raise Exception("No weather could be fetched for the grid")
+
+    async def predict(fn, rows):
+        if run_cpu is None:
+            return fn(rows)
+        return await run_cpu(fn, rows, endpoint="grid")
+
+    pred_solar, pred_wind, pred_aqi = await asyncio.gather(
+        predict(predict_power_solar_batch, [solar_input_from_weather(item) for item in data]),
+        predict(predict_power_wind_batch, [wind_input_from_weather(item) for item in data]),
+        predict(predict_aqi_batch, [airq_input_from_weather(item) for item in data])
+    )
+
+    values = np.full((len(GRID_LAYERS), spec.n_lat * spec.n_lon), np.nan, dtype=np.float32)
+    values[0, fetched] = [row['predicted_power_kw'] for row in pred_solar]
+    values[1, fetched] = [row['predicted_power'] for row in pred_wind]
+    values[2, fetched] = pred_aqi
+    return values.reshape(len(GRID_LAYERS), spec.n_lat, spec.n_lon)
+
+def write_grid(path: str, spec: GridSpec, values: np.ndarray, generated_at: datetime):
+    header = json.dumps({
+        "layers": list(GRID_LAYERS),
+        "min_lat": spec.min_lat,
+        "min_lon": spec.min_lon,
+        "resolution": spec.resolution,
+        "n_lat": spec.n_lat,
+        "n_lon": spec.n_lon,
+        "generated_at": generated_at.isoformat()
+    }).encode()
+    if len(header) > HEADER_SIZE:
+        raise Exception("Grid header does not fit in the reserved header block")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b" "))
+        f.write(np.ascontiguousarray(values, dtype="<f4").tobytes())
+    os.replace(tmp_path, path)
+
+async def refresh_grid(path: str = GRID_PATH, spec: GridSpec = None, run_cpu=None, min_age: float = 0) -> bool:
+    spec = spec or national_grid_spec()
+
+    # Every API worker runs the schedule; whoever holds the lock builds the
+    # grid and the rest skip the round.
+    with open(f"{path}.lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            if min_age > 0 and os.path.exists(path) and time.time() - os.path.getmtime(path) < min_age:
+                return False
+
+            values = await score_grid(spec, run_cpu)
+            write_grid(path, spec, values, datetime.now())
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+async def refresh_forever(minutes: float, path: str = GRID_PATH, run_cpu=None):
+    interval = minutes * 60
+    while True:
+        try:
+            await refresh_grid(path, run_cpu=run_cpu, min_age=interval / 2)
+        except Exception as e:
+            print(f"Grid refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+class GridReader:
+    def __init__(self, path: str = GRID_PATH, reload_check: float = GRID_RELOAD_CHECK):
+        self.path = path
+        self.reload_check = reload_check
+        self._grid = None
+        self._file_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            meta = json.loads(f.read(HEADER_SIZE))
+        values = np.memmap(
+            self.path,
+            dtype="<f4",
+            mode="r",
+            offset=HEADER_SIZE,
+            shape=(len(meta['layers']), meta['n_lat'], meta['n_lon'])
+        )
+        return meta, values
+
+    def current(self):
+        now = time.monotonic()
+        if self._grid is not None and now - self._checked_at < self.reload_check:
+            return self._grid
+
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                raise Exception("National grid has not been generated yet")
+
+            file_id = (stat.st_ino, stat.st_mtime_ns)
+            if file_id != self._file_id:
+                self._grid = self._load()
+                self._file_id = file_id
+            self._checked_at = now
+            return self._grid
+
+    def point(self, lat: float, lon: float) -> dict:
+        meta, values = self.current()
+        fi = (lat - meta['min_lat']) / meta['resolution']
+        fj = (lon - meta['min_lon']) / meta['resolution']
+        if not (0 <= fi <= meta['n_lat'] - 1 and 0 <= fj <= meta['n_lon'] - 1):
+            raise Exception("Point is outside the national grid")
+
+        i = min(int(fi), meta['n_lat'] - 2)
+        j = min(int(fj), meta['n_lon'] - 2)
+        ti, tj = fi - i, fj - j
+        weights = np.array([[(1 - ti) * (1 - tj), (1 - ti) * tj], [ti * (1 - tj), ti * tj]])
+
+        # Nodes whose weather fetch failed are NaN; spread their weight over
+        # the remaining corners instead of poisoning the whole cell.
+        corners = np.asarray(values[:, i:i + 2, j:j + 2], dtype=np.float64)
+        valid = ~np.isnan(corners)
+        total = (np.where(valid, corners, 0) * weights).sum(axis=(1, 2))
+        weight = (valid * weights).sum(axis=(1, 2))
+
+        result = {
+            name: float(total[k] / weight[k]) if weight[k] > 0 else None
+            for k, name in enumerate(meta['layers'])
+        }
+        result["generated_at"] = meta['generated_at']
+        return result
+
+    def tile(self, bbox, layers=None, stride: int = 1) -> dict:
+        meta, values = self.current()
+        min_lat, min_lon, max_lat, max_lon = bbox
+        resolution = meta['resolution']
+        i0 = max(0, math.ceil((min_lat - meta['min_lat']) / resolution))
+        i1 = min(meta['n_lat'] - 1, math.floor((max_lat - meta['min_lat']) / resolution))
+        j0 = max(0, math.ceil((min_lon - meta['min_lon']) / resolution))
+        j1 = min(meta['n_lon'] - 1, math.floor((max_lon - meta['min_lon']) / resolution))
+        rows = slice(i0, i1 + 1, stride)
+        cols = slice(j0, j1 + 1, stride)
+
+        lats = meta['min_lat'] + resolution * np.arange(meta['n_lat'])[rows]
+        lons = meta['min_lon'] + resolution * np.arange(meta['n_lon'])[cols]
+        selected = [name for name in meta['layers'] if layers is None or name in layers]
+
+        return {
+            "lats": lats.round(6).tolist(),
+            "lons": lons.round(6).tolist(),
+            "layers": {
+                name: [
+                    [None if math.isnan(value) else float(value) for value in row]
+                    for row in values[meta['layers'].index(name), rows, cols]
+                ]
+                for name in selected
+            },
+            "generated_at": meta['generated_at']
+        }
+
+
+grid_reader = GridReader()
+
+def main():
+    parser = argparse.ArgumentParser(description="Score solar, wind and AQI over the national grid")
+    parser.add_argument("--out", default=GRID_PATH, help="Grid file to publish")
+    parser.add_argument("--resolution", type=float, default=GRID_RESOLUTION, help="Grid spacing in degrees")
+    parser.add_argument("--interval", type=float, default=GRID_REFRESH_MINUTES, help="Rebuild every N minutes (0 builds once)")
+    args = parser.parse_args()
+
+    from utils.registry import registry
+    registry.load_all()
+
+    spec = national_grid_spec(args.resolution)
+    print(f"Scoring {spec.n_lat}x{spec.n_lon} grid into {args.out}")
+
+    async def run():
+        try:
+            while True:
+                started = time.perf_counter()
+                await refresh_grid(args.out, spec)
+                print(f"Grid published in {time.perf_counter() - started:.1f}s")
+                if args.interval <= 0:
+                    break
+                await asyncio.sleep(args.interval * 60)
+        finally:
+            await owa_client.aclose()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
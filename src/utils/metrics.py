@@ -0,0 +1,173 @@
+import functools
+import glob
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from utils.tracing import span
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "vaidya_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "vaidya_stage_duration_seconds",
+    "Latency of individual request stages",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "vaidya_stage_errors_total",
+    "Exceptions raised inside a request stage",
+    ["stage"]
+)
+EXECUTOR_LATENCY = Histogram(
+    "vaidya_executor_duration_seconds",
+    "Time from submitting work to an executor pool until it completes",
+    ["pool", "endpoint"],
+    buckets=LATENCY_BUCKETS
+)
+
+# Stages finished inside a CPU pool call, collected so the API process can
+# record them (see collect_stages).
+_stage_sink: ContextVar[Optional[list]] = ContextVar("stage_sink", default=None)
+
+# Every stage is also a trace span, so the per-request span tree and the
+# stage histograms always describe the same boundaries.
+@contextmanager
+def stage(name: str, **attributes):
+    started = time.perf_counter()
+    failed = False
+    try:
+        with span(name, **attributes) as current:
+            yield current
+    except Exception:
+        failed = True
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        sink = _stage_sink.get()
+        if sink is not None:
+            sink.append((name, elapsed, failed))
+
+def collect_stages(fn):
+    # Runs in a CPU pool worker. Without PROMETHEUS_MULTIPROC_DIR the
+    # worker's own samples are never scraped, so the stages it ran are sent
+    # back with the result (or on the exception) for replay_stages.
+    stages = []
+    token = _stage_sink.set(stages)
+    try:
+        return fn(), stages
+    except Exception as e:
+        e.stages = stages
+        raise
+    finally:
+        _stage_sink.reset(token)
+
+def replay_stages(stages: list):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return
+    for name, elapsed, failed in stages:
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        if failed:
+            STAGE_ERRORS.labels(name).inc()
+
+def timed(name: str):
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Reads the stats() dictionaries kept by caches and services at scrape time,
+# so nothing extra runs on the request path.
+class StatsCollector:
+    HIVE_WRITER_FIELDS = ("offered_rows", "rejected_rows", "written_rows", "flushes", "failed_flushes", "dead_letter_rows", "pending_rows", "retrying_rows")
+
+    def __init__(self):
+        self._cache_sources: List[Callable[[], Dict[str, dict]]] = []
+        self._spark_stats: Callable[[], dict] = None
+
+    def add_caches(self, source: Callable[[], Dict[str, dict]]):
+        self._cache_sources.append(source)
+
+    def set_spark_stats(self, source: Callable[[], dict]):
+        self._spark_stats = source
+
+    def collect(self):
+        hits = CounterMetricFamily("vaidya_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("vaidya_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("vaidya_cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        size = GaugeMetricFamily("vaidya_cache_entries", "Entries currently cached", labels=["cache"])
+        for source in self._cache_sources:
+            for name, stats in source().items():
+                hits.add_metric([name], stats.get("hits", 0))
+                misses.add_metric([name], stats.get("misses", 0))
+                ratio.add_metric([name], stats.get("hit_ratio", 0.0))
+                if "size" in stats:
+                    size.add_metric([name], stats["size"])
+        yield from (hits, misses, ratio, size)
+
+        if self._spark_stats is None:
+            return
+        try:
+            stats = self._spark_stats()
+        except Exception:
+            return
+
+        jobs = CounterMetricFamily("vaidya_spark_jobs", "Spark jobs run by the Spark service", labels=["op"])
+        for op, count in stats.get("spark", {}).get("jobs", {}).items():
+            jobs.add_metric([op], count)
+        yield jobs
+        yield GaugeMetricFamily("vaidya_spark_active_jobs", "Spark jobs currently running", value=stats.get("spark", {}).get("active_jobs", 0))
+
+        writer = GaugeMetricFamily("vaidya_hive_writer", "Hive write buffer counters", labels=["field"])
+        for field in self.HIVE_WRITER_FIELDS:
+            writer.add_metric([field], stats.get("hive_writer", {}).get(field, 0))
+        yield writer
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+def render_metrics() -> bytes:
+    # With PROMETHEUS_MULTIPROC_DIR set (several API workers, or predictions
+    # in the CPU process pool), merge what every process has recorded.
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def clear_multiproc_dir():
+    # Samples left by an earlier run would otherwise be merged into this
+    # one. Call once before any worker starts.
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for db_file in glob.glob(os.path.join(path, "*.db")):
+            os.remove(db_file)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
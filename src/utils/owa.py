@@ -1,10 +1,32 @@
+import asyncio
+import json
 import math
+import httpx
+import numpy as np
 import requests
 import os
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from utils.cache import TTLCache
+from utils.metrics import stage, timed
+from utils.tracing import set_attributes, span
 
 api_key = os.getenv('OWA_API_KEY')
+owa_base_url = os.getenv('OWA_BASE_URL', 'https://api.openweathermap.org/data/2.5')
+
+weather_cache_grid = float(os.getenv('WEATHER_CACHE_GRID', '0.01'))
+weather_cache = TTLCache(
+    maxsize=int(os.getenv('WEATHER_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('WEATHER_CACHE_TTL', '600'))
+)
+
+FORECAST_MAX_STEPS = 40
+forecast_file = os.getenv('OWA_FORECAST_FILE')
+forecast_cache = TTLCache(
+    maxsize=int(os.getenv('FORECAST_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('FORECAST_CACHE_TTL', '1800'))
+)
 
 def convert_kelvin_to_celsius(temp: float) -> float:
     return temp - 273.15
@@ -81,10 +103,264 @@ def transform_weather_data(raw_data: Dict[str, Any]) -> Dict[str, float]:
     
     return transformed_data
 
+UTC_OFFSET_BUCKET = 900
+
+def _utc_offsets(timestamps: np.ndarray) -> np.ndarray:
+    return np.array([time.localtime(int(timestamp)).tm_gmtoff for timestamp in timestamps], dtype=np.int64)
+
+def local_timestamps(timestamps) -> np.ndarray:
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    days, inverse = np.unique(timestamps // 86400, return_inverse=True)
+    inverse = inverse.reshape(timestamps.shape)
+    day_start = _utc_offsets(days * 86400)
+    day_end = _utc_offsets(days * 86400 + 86399)
+    offsets = day_start[inverse]
+
+    transition = (day_start != day_end)[inverse]
+    if transition.any():
+        buckets, bucket_inverse = np.unique(timestamps[transition] // UTC_OFFSET_BUCKET, return_inverse=True)
+        offsets[transition] = _utc_offsets(buckets * UTC_OFFSET_BUCKET)[bucket_inverse.ravel()]
+
+    return timestamps + offsets
+
+def calculate_dewpoint_array(temp_k, relative_humidity) -> np.ndarray:
+    temp_c = np.asarray(temp_k, dtype=np.float64) - 273.15
+    b = 17.62
+    c = 243.12
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log(np.asarray(relative_humidity, dtype=np.float64) / 100) + (b * temp_c) / (c + temp_c)
+        return (c * gamma) / (b - gamma)
+
+def calculate_solar_position_array(lat, lon, timestamp) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    local = local_timestamps(timestamp).astype('datetime64[s]')
+    minutes = (local - local.astype('datetime64[D]')).astype(np.int64) // 60
+    hour = minutes // 60 + (minutes % 60) / 60
+    days = local.astype('datetime64[D]')
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(np.int64) + 1
+
+    declination = 23.45 * np.sin(np.radians(360/365 * (day_of_year - 81)))
+    hour_angle = 15 * (hour - 12)
+
+    lat_rad = np.radians(np.asarray(lat, dtype=np.float64))
+    decl_rad = np.radians(declination)
+    hour_rad = np.radians(hour_angle)
+
+    zenith = np.degrees(np.arccos(np.clip(
+        np.sin(lat_rad) * np.sin(decl_rad) +
+        np.cos(lat_rad) * np.cos(decl_rad) * np.cos(hour_rad),
+        -1, 1
+    )))
+
+    azimuth = np.degrees(np.arctan2(
+        -np.cos(decl_rad) * np.sin(hour_rad),
+        np.cos(lat_rad) * np.sin(decl_rad) -
+        np.sin(lat_rad) * np.cos(decl_rad) * np.cos(hour_rad)
+    ))
+    azimuth = (azimuth + 360) % 360
+
+    angle_of_incidence = zenith
+    return zenith, azimuth, angle_of_incidence
+
+def transform_weather_arrays(
+    lat,
+    lon,
+    timestamp,
+    temp,
+    humidity,
+    pressure,
+    clouds,
+    wind_speed,
+    wind_deg,
+    wind_gust=None,
+    rain=None,
+    snow=None
+) -> Dict[str, np.ndarray]:
+    temp = np.asarray(temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    clouds = np.asarray(clouds, dtype=np.float64)
+    wind_speed = np.asarray(wind_speed, dtype=np.float64)
+    wind_deg = np.asarray(wind_deg, dtype=np.float64)
+    rain = np.zeros_like(temp) if rain is None else np.asarray(rain, dtype=np.float64)
+    snow = np.zeros_like(temp) if snow is None else np.asarray(snow, dtype=np.float64)
+    if wind_gust is None:
+        wind_gust = wind_speed * 1.5
+    else:
+        wind_gust = np.asarray(wind_gust, dtype=np.float64)
+        wind_gust = np.where(np.isnan(wind_gust), wind_speed * 1.5, wind_gust)
+
+    zenith, azimuth, angle_of_incidence = calculate_solar_position_array(lat, lon, timestamp)
+
+    return {
+        'temperature_2_m_above_gnd': temp,
+        'relative_humidity_2_m_above_gnd': humidity,
+        'dewpoint_2m': calculate_dewpoint_array(temp, humidity),
+        'mean_sea_level_pressure_MSL': np.asarray(pressure, dtype=np.float64),
+        'total_precipitation_sfc': rain + snow,
+        'snowfall_amount_sfc': snow,
+        'total_cloud_cover_sfc': clouds,
+        'high_cloud_cover_high_cld_lay': clouds * 0.33,
+        'medium_cloud_cover_mid_cld_lay': clouds * 0.33,
+        'low_cloud_cover_low_cld_lay': clouds * 0.34,
+        'shortwave_radiation_backwards_sfc': np.maximum(0, 1000 * (1 - clouds/100) * np.cos(np.radians(zenith))),
+        'wind_speed_10_m_above_gnd': wind_speed,
+        'wind_direction_10_m_above_gnd': wind_deg,
+        'wind_speed_80_m_above_gnd': wind_speed * (80/10)**0.143,
+        'wind_direction_80_m_above_gnd': wind_deg + 10,
+        'wind_speed_900_mb': wind_speed * 1.5,
+        'wind_direction_900_mb': wind_deg + 20,
+        'wind_gust_10_m_above_gnd': wind_gust,
+        'angle_of_incidence': angle_of_incidence,
+        'zenith': zenith,
+        'azimuth': azimuth,
+    }
+
+def hourly_precipitation(amounts: Dict[str, float]) -> float:
+    if '1h' in amounts:
+        return amounts['1h']
+    return amounts.get('3h', 0) / 3
+
+def weather_columns_from_raw(raw_items: List[Dict[str, Any]], coord: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    columns = {name: [] for name in (
+        'lat', 'lon', 'timestamp', 'temp', 'humidity', 'pressure', 'clouds',
+        'wind_speed', 'wind_deg', 'wind_gust', 'rain', 'snow'
+    )}
+    for raw_data in raw_items:
+        main = raw_data.get('main', {})
+        wind = raw_data.get('wind', {})
+        item_coord = raw_data.get('coord', coord)
+        columns['lat'].append(item_coord['lat'])
+        columns['lon'].append(item_coord['lon'])
+        columns['timestamp'].append(raw_data['dt'])
+        columns['temp'].append(main.get('temp', 0))
+        columns['humidity'].append(main.get('humidity', 0))
+        columns['pressure'].append(main.get('sea_level', main.get('pressure', 0)))
+        columns['clouds'].append(raw_data.get('clouds', {}).get('all', 0))
+        columns['wind_speed'].append(wind.get('speed', 0))
+        columns['wind_deg'].append(wind.get('deg', 0))
+        columns['wind_gust'].append(wind.get('gust', math.nan))
+        columns['rain'].append(hourly_precipitation(raw_data.get('rain', {})))
+        columns['snow'].append(hourly_precipitation(raw_data.get('snow', {})))
+
+    columns['timestamp'] = np.asarray(columns['timestamp'], dtype=np.int64)
+    return {
+        name: values if name == 'timestamp' else np.asarray(values, dtype=np.float64)
+        for name, values in columns.items()
+    }
+
+def transform_weather_batch(raw_items: List[Dict[str, Any]], coord: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    return transform_weather_arrays(**weather_columns_from_raw(raw_items, coord))
+
+@timed("owa.weather")
 def get_complete_weather(lat: str, lon: str, api_key=api_key) -> Dict[str, float]:
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
+    url = f"{owa_base_url}/weather?lat={lat}&lon={lon}&appid={api_key}"
     response = requests.get(url)
     response.raise_for_status()
     raw_data = response.json()
     
     return transform_weather_data(raw_data)
+
+class OWAClient:
+    def __init__(
+        self,
+        base_url: str = owa_base_url,
+        api_key: str = api_key,
+        timeout: float = float(os.getenv('OWA_TIMEOUT', '5')),
+        connect_timeout: float = float(os.getenv('OWA_CONNECT_TIMEOUT', '2')),
+        max_connections: int = int(os.getenv('OWA_MAX_CONNECTIONS', '20')),
+        max_concurrency: int = int(os.getenv('OWA_MAX_CONCURRENCY', '10')),
+        keepalive_expiry: float = float(os.getenv('OWA_KEEPALIVE_EXPIRY', '30'))
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def get(self, path: str, lat: str, lon: str, **params) -> Dict[str, Any]:
+        client = self._get_client()
+        async with self._semaphore:
+            with stage(f"owa.{path.strip('/')}"):
+                response = await client.get(path, params={
+                    'lat': lat,
+                    'lon': lon,
+                    'appid': self.api_key,
+                    **params
+                })
+                response.raise_for_status()
+        return response.json()
+
+    async def get_weather(self, lat: str, lon: str) -> Dict[str, Any]:
+        return await self.get('/weather', lat, lon)
+
+    async def get_forecast(self, lat: str, lon: str, steps: int = FORECAST_MAX_STEPS) -> Dict[str, Any]:
+        return await self.get('/forecast', lat, lon, cnt=steps)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+owa_client = OWAClient()
+
+async def get_complete_weather_async(lat: str, lon: str) -> Dict[str, float]:
+    raw_data = await owa_client.get_weather(lat, lon)
+    return transform_weather_data(raw_data)
+
+def quantize_coords(lat: str, lon: str, grid: float = weather_cache_grid) -> Tuple[float, float]:
+    q_lat = round(round(float(lat) / grid) * grid, 6)
+    q_lon = round(round(float(lon) / grid) * grid, 6)
+    return q_lat, q_lon
+
+_inflight: Dict[Tuple[float, float], asyncio.Task] = {}
+
+async def get_cached_weather(lat: str, lon: str) -> Dict[str, float]:
+    key = quantize_coords(lat, lon)
+    with span("weather", lat=key[0], lon=key[1]):
+        data = weather_cache.get(key)
+        set_attributes(cache_hit=data is not None)
+        if data is None:
+            task = _inflight.get(key)
+            set_attributes(coalesced=task is not None)
+            if task is None:
+                task = asyncio.ensure_future(get_complete_weather_async(*key))
+                _inflight[key] = task
+                task.add_done_callback(lambda _: _inflight.pop(key, None))
+            data = await asyncio.shield(task)
+            weather_cache.set(key, data)
+
+    return dict(data)
+
+def load_forecast_file(path: str, lat: str, lon: str) -> Dict[str, Any]:
+    with open(path) as f:
+        forecast = json.load(f)
+    forecast.setdefault('city', {}).setdefault('coord', {'lat': float(lat), 'lon': float(lon)})
+    return forecast
+
+async def get_cached_forecast(lat: str, lon: str) -> Dict[str, Any]:
+    if forecast_file:
+        return load_forecast_file(forecast_file, lat, lon)
+
+    key = quantize_coords(lat, lon)
+    forecast = forecast_cache.get(key)
+    if forecast is None:
+        forecast = await owa_client.get_forecast(*key)
+        forecast_cache.set(key, forecast)
+
+    return forecast
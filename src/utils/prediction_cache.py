@@ -0,0 +1,82 @@
+import os
+from typing import Any, Awaitable, Callable, Dict, List
+from utils.cache import TTLCache
+from utils.registry import registry
+from utils.tracing import set_attributes, span
+
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '8192'))
+
+prediction_caches: Dict[str, "PredictionCache"] = {}
+
+def quantize(values: Dict[str, Any], tolerances: Dict[str, float]) -> tuple:
+    key = []
+    for field, value in values.items():
+        tolerance = tolerances.get(field)
+        if tolerance and isinstance(value, (int, float)):
+            value = round(value / tolerance)
+        key.append(value)
+    return tuple(key)
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        name: str,
+        model_name: str,
+        tolerances: Dict[str, float],
+        features: Callable[[Any], Dict[str, Any]] = None,
+        maxsize: int = PREDICTION_CACHE_SIZE
+    ):
+        self.name = name
+        self.model_name = model_name
+        self.tolerances = tolerances
+        self.features = features or (lambda row: row.model_dump())
+        self.cache = TTLCache(maxsize=maxsize, ttl=0)
+        self._version = None
+        prediction_caches[name] = self
+
+    def key(self, row) -> tuple:
+        return quantize(self.features(row), self.tolerances)
+
+    def _check_version(self):
+        version = registry.version(self.model_name)
+        if version != self._version:
+            self.cache.clear()
+            self._version = version
+
+    async def run(self, rows: List[Any], predict: Callable[[List[Any]], Awaitable[List[Any]]]) -> List[Any]:
+        if not rows:
+            return []
+
+        with span(f"cache.{self.name}", rows=len(rows)):
+            self._check_version()
+            version = self._version
+            keys = [self.key(row) for row in rows]
+            results = [self.cache.get(key) for key in keys]
+            missing = {}
+            for i, result in enumerate(results):
+                if result is None:
+                    missing.setdefault(keys[i], []).append(i)
+            set_attributes(misses=len(missing))
+
+            if missing:
+                predicted = await predict([rows[indices[0]] for indices in missing.values()])
+                # A reload while the prediction was in flight means these results
+                # came from the old model; return them but don't keep them.
+                keep = registry.version(self.model_name) == version
+                for (key, indices), result in zip(missing.items(), predicted):
+                    for i in indices:
+                        results[i] = result
+                    if keep:
+                        self.cache.set(key, result)
+
+            return results
+
+    async def run_one(self, row, predict: Callable[[List[Any]], Awaitable[List[Any]]]):
+        return (await self.run([row], predict))[0]
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, "version": self._version, **self.cache.stats()}
+
+def prediction_cache_stats() -> Dict[str, dict]:
+    return {name: cache.stats() for name, cache in prediction_caches.items()}
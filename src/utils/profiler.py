@@ -0,0 +1,192 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Set
+
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+MAX_PROFILE_SECONDS = float(os.getenv('MAX_PROFILE_SECONDS', '300'))
+
+# Leaf frames of threads that are parked waiting for work.
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker")
+}
+
+_profiled: ContextVar[bool] = ContextVar("profiled", default=False)
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame, root: str) -> str:
+    frames = []
+    while frame is not None:
+        frames.append(frame_label(frame))
+        frame = frame.f_back
+    frames.append(root)
+    return ";".join(reversed(frames))
+
+def is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+def thread_root(name: str) -> str:
+    # Pool threads are numbered (io_0, io_1, ...); fold them into one root.
+    return re.sub(r"_\d+$", "", name)
+
+
+class StackSampler:
+    def __init__(self, interval: float, include=None, idle: bool = False):
+        self.interval = interval
+        self.include = include
+        self.idle = idle
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.counts
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            included = self.include() if self.include is not None else None
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (included is not None and thread_id not in included):
+                    continue
+                if not self.idle and is_idle(frame):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread_root(thread.name) for thread in threading.enumerate()}
+                self.counts[collapse_stack(frame, names.get(thread_id, "thread"))] += 1
+
+def profiled_call(interval: float, fn):
+    # Runs inside a CPU pool worker: sample the calling thread for the
+    # duration of the call and hand the stacks back with the result.
+    caller = {threading.get_ident()}
+    sampler = StackSampler(interval, include=lambda: caller)
+    sampler.start()
+    try:
+        result = fn()
+    finally:
+        counts = sampler.stop()
+    return result, {f"cpu-pool;{stack.split(';', 1)[1]}": count for stack, count in counts.items()}
+
+
+class ProfileSession:
+    def __init__(self, seconds: float, fraction: float, interval: float, sampler: StackSampler):
+        self.seconds = seconds
+        self.fraction = fraction
+        self.interval = interval
+        self.started = time.time()
+        self.requests = 0
+        self.sampler = sampler
+        # Stacks sent back by CPU pool workers, kept apart from the sampler's
+        # own counts since those are written from the sampler thread.
+        self.worker_counts = Counter()
+
+
+# Profiles a bounded window of this worker's traffic. While no session is
+# running every hook below reduces to a single attribute check.
+class Profiler:
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+        self._marked: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.session is not None
+
+    def start(self, seconds: float, fraction: float = 1.0, interval: float = PROFILE_INTERVAL_MS / 1000, idle: bool = False) -> ProfileSession:
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise ValueError(f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}]")
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+
+        with self._lock:
+            if self.session is not None:
+                raise Exception("A profile is already running")
+            interval = max(interval, 0.001)
+            session = self.session = ProfileSession(seconds, fraction, interval, StackSampler(interval, include=self.marked_threads, idle=idle))
+        session.sampler.start()
+        return session
+
+    def stop(self, session: ProfileSession) -> dict:
+        with self._lock:
+            if self.session is session:
+                self.session = None
+        counts = session.sampler.stop() + session.worker_counts
+        return {
+            "samples": session.sampler.samples,
+            "requests": session.requests,
+            "seconds": time.time() - session.started,
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in sorted(counts.items()))
+        }
+
+    def marked_threads(self) -> Set[int]:
+        return set(self._marked)
+
+    def _mark(self, thread_id: int, delta: int):
+        with self._lock:
+            count = self._marked.get(thread_id, 0) + delta
+            if count > 0:
+                self._marked[thread_id] = count
+            else:
+                self._marked.pop(thread_id, None)
+
+    @contextmanager
+    def request(self):
+        session = self.session
+        if session is None or (session.fraction < 1 and random.random() >= session.fraction):
+            yield
+            return
+
+        # The event loop thread interleaves requests, so it is sampled while
+        # any profiled request is in flight. Pool threads are only sampled
+        # while running work for a profiled request.
+        session.requests += 1
+        token = _profiled.set(True)
+        thread_id = threading.get_ident()
+        self._mark(thread_id, 1)
+        try:
+            yield
+        finally:
+            self._mark(thread_id, -1)
+            _profiled.reset(token)
+
+    def wants_profile(self) -> bool:
+        return self.session is not None and _profiled.get()
+
+    def run_marked(self, fn):
+        thread_id = threading.get_ident()
+        self._mark(thread_id, 1)
+        try:
+            return fn()
+        finally:
+            self._mark(thread_id, -1)
+
+    def merge(self, counts: Dict[str, int]):
+        session = self.session
+        if session is not None:
+            session.worker_counts.update(counts)
+
+
+profiler = Profiler()
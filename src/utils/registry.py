@@ -0,0 +1,237 @@
+import json
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import joblib
+import torch
+
+from models_spark.local_scorer import LocalCropScorer
+from utils.crop_model import CropInferenceEngine, CropRecommender, configure_torch_threads
+
+
+@dataclass(frozen=True)
+class SolarModel:
+    model: Any
+    scaler: Any
+    feature_names: List[str]
+
+
+@dataclass(frozen=True)
+class WindModel:
+    model: Any
+    scaler: Any
+
+
+@dataclass(frozen=True)
+class AirQualityModel:
+    model: Any
+
+
+@dataclass(frozen=True)
+class CropModel:
+    engine: CropInferenceEngine
+
+
+@dataclass(frozen=True)
+class ModelEntry:
+    name: str
+    path: str
+    version: int
+    handle: Any
+    loaded_at: float = field(default_factory=time.time)
+    mtime: Optional[float] = None
+
+
+def load_solar(path: str) -> SolarModel:
+    with open(path, 'rb') as f:
+        model_data = pickle.load(f)
+    return SolarModel(
+        model=model_data['model'],
+        scaler=model_data['scaler'],
+        feature_names=model_data['feature_names']
+    )
+
+def load_wind(path: str) -> WindModel:
+    with open(path, 'rb') as f:
+        model_data = pickle.load(f)
+    return WindModel(model=model_data['model'], scaler=model_data['scaler'])
+
+def load_airq(path: str) -> AirQualityModel:
+    with open(path, 'rb') as f:
+        return AirQualityModel(model=pickle.load(f))
+
+def load_spark_crop(path: str) -> LocalCropScorer:
+    # A release directory carries its own stats; fall back to the global file.
+    stats_path = os.path.join(os.path.dirname(path), 'crop_stats.json')
+    if not os.path.exists(stats_path):
+        stats_path = os.getenv('SPARK_CROP_STATS_PATH', 'crop_stats_test_spark.txt')
+    return LocalCropScorer.load(path, stats_path)
+
+def load_crop_recommender(path: str) -> CropRecommender:
+    base_dir = os.path.dirname(path)
+    recommender = CropRecommender()
+    recommender.model.load_state_dict(torch.load(path, map_location=recommender.device))
+    recommender.model.eval()
+    recommender.scaler = joblib.load(os.path.join(base_dir, 'scaler.pkl'))
+    recommender.label_encoder = joblib.load(os.path.join(base_dir, 'label_encoder.pkl'))
+    with open(os.path.join(base_dir, 'crop_stats.txt'), 'r') as f:
+        recommender.crop_stats = json.load(f)
+    return recommender
+
+def load_crop(path: str) -> CropModel:
+    return CropModel(engine=CropInferenceEngine.from_recommender(load_crop_recommender(path)))
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[str], Any]] = {}
+        self._paths: Dict[str, str] = {}
+        self._entries: Dict[str, ModelEntry] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self._listeners: List[Callable[[ModelEntry], None]] = []
+
+    def register(self, name: str, path: str, loader: Callable[[str], Any]):
+        self._loaders[name] = loader
+        self._paths[name] = path
+
+    def names(self) -> List[str]:
+        return list(self._loaders)
+
+    def add_listener(self, listener: Callable[[ModelEntry], None]):
+        self._listeners.append(listener)
+
+    def load(self, name: str, path: Optional[str] = None, version: Optional[int] = None) -> ModelEntry:
+        if name not in self._loaders:
+            raise Exception(f"Unknown model '{name}'")
+
+        path = path or self._paths[name]
+        try:
+            handle = self._loaders[name](path)
+        except FileNotFoundError:
+            self._errors[name] = f"Model file '{path}' not found!"
+            raise Exception(self._errors[name])
+        except Exception as e:
+            self._errors[name] = f"Error loading model: {str(e)}"
+            raise Exception(self._errors[name])
+
+        with self._lock:
+            previous = self._entries.get(name)
+            entry = ModelEntry(
+                name=name,
+                path=path,
+                version=version or (previous.version + 1 if previous else 1),
+                handle=handle,
+                mtime=_mtime(path)
+            )
+            self._entries[name] = entry
+            self._paths[name] = path
+            self._errors.pop(name, None)
+
+        for listener in self._listeners:
+            listener(entry)
+
+        return entry
+
+    def load_all(self, snapshot: Optional[Dict[str, dict]] = None):
+        for name in self._loaders:
+            loaded = (snapshot or {}).get(name, {})
+            try:
+                self.load(name, loaded.get("path"), loaded.get("version"))
+            except Exception as e:
+                print(f"Skipping model '{name}': {str(e)}")
+
+    def snapshot(self) -> Dict[str, dict]:
+        # What is loaded right now, so another process can load the same
+        # artifacts under the same versions.
+        with self._lock:
+            return {name: {"path": entry.path, "version": entry.version} for name, entry in self._entries.items()}
+
+    def entry(self, name: str) -> ModelEntry:
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self.load(name)
+        return entry
+
+    def get(self, name: str) -> Any:
+        return self.entry(name).handle
+
+    def version(self, name: str) -> int:
+        entry = self._entries.get(name)
+        return entry.version if entry else 0
+
+    def status(self) -> Dict[str, dict]:
+        status = {}
+        for name in self._loaders:
+            entry = self._entries.get(name)
+            status[name] = {
+                "path": entry.path if entry else self._paths[name],
+                "version": entry.version if entry else 0,
+                "loaded_at": entry.loaded_at if entry else None,
+                "error": self._errors.get(name)
+            }
+        return status
+
+    def check_for_updates(self):
+        for name, entry in list(self._entries.items()):
+            mtime = _mtime(entry.path)
+            if mtime is not None and mtime != entry.mtime:
+                try:
+                    self.load(name, entry.path)
+                    print(f"Reloaded model '{name}' from {entry.path}")
+                except Exception as e:
+                    print(f"Failed to reload model '{name}': {str(e)}")
+
+    def watch(self, interval: float):
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop_watching.wait(interval):
+                self.check_for_updates()
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=run, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+configure_torch_threads()
+
+registry = ModelRegistry()
+registry.register('solar', os.getenv('SOLAR_MODEL_PATH', 'solar_power_model.pkl'), load_solar)
+registry.register('wind', os.getenv('WIND_MODEL_PATH', 'random_forest_model_1.pkl'), load_wind)
+registry.register('airq', os.getenv('AIRQ_MODEL_PATH', 'air_pollution.pkl'), load_airq)
+registry.register('crop', os.getenv('CROP_MODEL_PATH', 'crop_recommender.pt'), load_crop)
+registry.register('spark_crop', os.getenv('SPARK_CROP_ARTIFACT_PATH', 'spark_crop_recommender.npz'), load_spark_crop)
+
+def get_solar_model() -> SolarModel:
+    return registry.get('solar')
+
+def get_wind_model() -> WindModel:
+    return registry.get('wind')
+
+def get_airq_model() -> AirQualityModel:
+    return registry.get('airq')
+
+def get_crop_model() -> CropModel:
+    return registry.get('crop')
+
+def get_spark_crop_scorer() -> LocalCropScorer:
+    return registry.get('spark_crop')
@@ -1,7 +1,11 @@
+from typing import ClassVar, Dict, List
 from fastapi import HTTPException
 from pydantic import BaseModel
-import pickle
+import numpy as np
 import pandas as pd
+from utils.metrics import timed
+from utils.prediction_cache import PredictionCache
+from utils.registry import get_solar_model
 
 class SolarPowerInput(BaseModel):
     temperature_2_m_above_gnd: float
@@ -25,55 +29,72 @@ class SolarPowerInput(BaseModel):
     zenith: float
     azimuth: float
 
+    tolerances: ClassVar[Dict[str, float]] = {
+        'temperature_2_m_above_gnd': 0.1,
+        'relative_humidity_2_m_above_gnd': 1,
+        'mean_sea_level_pressure_MSL': 0.5,
+        'total_precipitation_sfc': 0.1,
+        'snowfall_amount_sfc': 0.1,
+        'total_cloud_cover_sfc': 1,
+        'high_cloud_cover_high_cld_lay': 0.5,
+        'medium_cloud_cover_mid_cld_lay': 0.5,
+        'low_cloud_cover_low_cld_lay': 0.5,
+        'shortwave_radiation_backwards_sfc': 5,
+        'wind_speed_10_m_above_gnd': 0.1,
+        'wind_direction_10_m_above_gnd': 5,
+        'wind_speed_80_m_above_gnd': 0.1,
+        'wind_direction_80_m_above_gnd': 5,
+        'wind_speed_900_mb': 0.1,
+        'wind_direction_900_mb': 5,
+        'wind_gust_10_m_above_gnd': 0.2,
+        'angle_of_incidence': 0.25,
+        'zenith': 0.25,
+        'azimuth': 0.25,
+    }
 
-async def predict_power_solar(data: SolarPowerInput):
-    try:
-        with open('solar_power_model.pkl', 'rb') as f:
-            model_data = pickle.load(f)
-            model = model_data['model']
-            scaler = model_data['scaler']
-            feature_names = model_data['feature_names']
-    except Exception as e:
-        raise Exception(f"Error loading model: {str(e)}")
-    
-    try:
-        input_data = pd.DataFrame([[
-            data.temperature_2_m_above_gnd,
-            data.relative_humidity_2_m_above_gnd,
-            data.mean_sea_level_pressure_MSL,
-            data.total_precipitation_sfc,
-            data.snowfall_amount_sfc,
-            data.total_cloud_cover_sfc,
-            data.high_cloud_cover_high_cld_lay,
-            data.medium_cloud_cover_mid_cld_lay,
-            data.low_cloud_cover_low_cld_lay,
-            data.shortwave_radiation_backwards_sfc,
-            data.wind_speed_10_m_above_gnd,
-            data.wind_direction_10_m_above_gnd,
-            data.wind_speed_80_m_above_gnd,
-            data.wind_direction_80_m_above_gnd,
-            data.wind_speed_900_mb,
-            data.wind_direction_900_mb,
-            data.wind_gust_10_m_above_gnd,
-            data.angle_of_incidence,
-            data.zenith,
-            data.azimuth
-        ]], columns=feature_names)
 
-        input_scaled = scaler.transform(input_data)
-        
-        prediction = model.predict(input_scaled)[0]
+solar_cache = PredictionCache("solar", "solar", SolarPowerInput.tolerances)
 
-        return {
-            "predicted_power_kw": float(prediction),
-            "status": "success"
-        }
+def solar_input_from_weather(data: dict) -> SolarPowerInput:
+    return SolarPowerInput(**{field: data[field] for field in SolarPowerInput.model_fields})
+
+@timed("predict.solar")
+def predict_power_solar_columns(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    solar_model = get_solar_model()
+
+    input_data = pd.DataFrame(
+        np.column_stack([np.asarray(columns[field], dtype=np.float64) for field in SolarPowerInput.model_fields]),
+        columns=solar_model.feature_names
+    )
+    input_scaled = solar_model.scaler.transform(input_data)
+
+    return solar_model.model.predict(input_scaled)
+
+def predict_power_solar_batch(rows: List[SolarPowerInput]) -> List[dict]:
+    if not rows:
+        return []
+
+    try:
+        predictions = predict_power_solar_columns({
+            field: [getattr(row, field) for row in rows]
+            for field in SolarPowerInput.model_fields
+        })
+
+        return [
+            {
+                "predicted_power_kw": float(prediction),
+                "status": "success"
+            }
+            for prediction in predictions
+        ]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def predict_power_solar(data: SolarPowerInput):
+    return predict_power_solar_batch([data])[0]
+
 if __name__ == "__main__":
-    import asyncio
     data = SolarPowerInput(
         temperature_2_m_above_gnd=10.0,
         relative_humidity_2_m_above_gnd=0.5,
@@ -97,6 +118,5 @@ if __name__ == "__main__":
         azimuth=180.0
     )
     
-    loop = asyncio.get_event_loop()
-    result = loop.run_until_complete(predict_power_solar(data))
+    result = predict_power_solar(data)
     print(result)
\ No newline at end of file
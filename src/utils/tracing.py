@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '1') == '1'
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_BUFFER = int(os.getenv('TRACE_BUFFER', '1000'))
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attributes", "status", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class TraceCollector:
+    def __init__(self, max_traces: int = TRACE_BUFFER, path: Optional[str] = TRACE_FILE):
+        self.max_traces = max_traces
+        self.path = path
+        self._traces: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span):
+        record = span.to_dict()
+        with self._lock:
+            # Spans can finish after their root (background inserts run once
+            # the response is sent), so traces are assembled span by span.
+            trace = self._traces.get(span.trace_id)
+            if trace is None:
+                trace = self._traces[span.trace_id] = {"root": None, "spans": []}
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            trace["spans"].append(record)
+            if span.parent_id is None:
+                trace["root"] = record
+
+            if self.path:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(json.dumps(record, default=str) + "\n")
+
+    def summaries(self, min_duration_ms: float = 0, name: Optional[str] = None, limit: int = 50, slowest: bool = False) -> List[dict]:
+        with self._lock:
+            roots = [trace["root"] for trace in self._traces.values() if trace["root"] is not None]
+
+        roots = [
+            root for root in roots
+            if root["duration_ms"] >= min_duration_ms and (name is None or name in root["name"])
+        ]
+        roots.sort(key=lambda root: root["duration_ms"] if slowest else root["start"], reverse=True)
+        return [
+            {key: root[key] for key in ("trace_id", "name", "start", "duration_ms", "status", "attributes")}
+            for root in roots[:limit]
+        ]
+
+    def tree(self, trace_id: str) -> Optional[dict]:
+        with self._lock:
+            trace = self._traces.get(trace_id)
+            spans = [dict(span) for span in trace["spans"]] if trace else None
+        if spans is None:
+            return None
+
+        by_id = {span["span_id"]: {**span, "children": []} for span in spans}
+        roots = []
+        for span in sorted(by_id.values(), key=lambda span: span["start"]):
+            parent = by_id.get(span["parent_id"])
+            (parent["children"] if parent else roots).append(span)
+        return {"trace_id": trace_id, "spans": roots}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+collector = TraceCollector()
+
+def _finish(span: Span, token, exc: Optional[BaseException]):
+    span.duration_ms = (time.time() - span.start) * 1000
+    if exc is not None:
+        span.status = "error"
+        span.error = f"{type(exc).__name__}: {exc}"
+    _current_span.reset(token)
+    collector.export(span)
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    if not TRACE_ENABLED or random.random() >= TRACE_SAMPLE_RATE:
+        yield None
+        return
+
+    span = Span(uuid.uuid4().hex, None, name, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        _finish(span, token, e)
+        raise
+    _finish(span, token, None)
+
+@contextmanager
+def span(name: str, **attributes):
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace_id, parent.span_id, name, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        _finish(child, token, e)
+        raise
+    _finish(child, token, None)
+
+def set_attributes(**attributes):
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+def trace_context() -> Optional[dict]:
+    current = _current_span.get()
+    if current is None:
+        return None
+    return {"trace_id": current.trace_id, "span_id": current.span_id}
@@ -1,24 +1,12 @@
 import datetime
-import pickle
-from typing import Optional
+from typing import ClassVar, Dict, List, Optional
 from fastapi import HTTPException
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel
-
-model_data = None
-
-def load_model():
-    global model_data
-    if model_data is None:
-        try:
-            with open('random_forest_model_1.pkl', 'rb') as file:
-                model_data = pickle.load(file)
-            return model_data
-        except FileNotFoundError:
-            raise Exception("Model file 'random_forest_model_1.pkl' not found!")
-        except Exception as e:
-            raise Exception(f"Error loading model: {str(e)}")
-    return model_data
+from utils.metrics import timed
+from utils.prediction_cache import PredictionCache
+from utils.registry import get_wind_model
 
 class WeatherData(BaseModel):
     temperature_2_m_above_gnd: float
@@ -31,64 +19,112 @@ class WeatherData(BaseModel):
     wind_gust_10_m_above_gnd: float
     timestamp: Optional[str] = None
 
-async def predict_power_wind(data: WeatherData):
+    tolerances: ClassVar[Dict[str, float]] = {
+        'temperature_2_m_above_gnd': 0.1,
+        'relative_humidity_2_m_above_gnd': 1,
+        'dewpoint_2m': 0.1,
+        'wind_speed_10_m_above_gnd': 0.1,
+        'windspeed_100m': 0.1,
+        'wind_direction_10_m_above_gnd': 5,
+        'winddirection_100m': 5,
+        'wind_gust_10_m_above_gnd': 0.2,
+    }
+
+def wind_cache_features(row: WeatherData) -> dict:
+    # Calendar features only change by the hour, so the hour is part of the key.
+    dt = pd.to_datetime(row.timestamp) if row.timestamp else datetime.datetime.now()
+    return {**row.model_dump(exclude={'timestamp'}), 'hour': dt.strftime('%Y-%m-%dT%H')}
+
+wind_cache = PredictionCache("wind", "wind", WeatherData.tolerances, features=wind_cache_features)
+
+def wind_input_from_weather(data: dict) -> WeatherData:
+    return WeatherData(
+        temperature_2_m_above_gnd=data['temperature_2_m_above_gnd'],
+        relative_humidity_2_m_above_gnd=data['relative_humidity_2_m_above_gnd'],
+        dewpoint_2m=data['dewpoint_2m'],
+        wind_speed_10_m_above_gnd=data['wind_speed_10_m_above_gnd'],
+        windspeed_100m=data['wind_speed_80_m_above_gnd'],
+        wind_direction_10_m_above_gnd=data['wind_direction_10_m_above_gnd'],
+        winddirection_100m=data['wind_direction_80_m_above_gnd'],
+        wind_gust_10_m_above_gnd=data['wind_gust_10_m_above_gnd'],
+    )
+
+WIND_FEATURES = [
+    'dewpoint_2m',
+    'winddirection_100m',
+    'windspeed_100m',
+    'hour',
+    'day', 
+    'month',
+    'year',
+    'temperature_2_m_above_gnd',
+    'relative_humidity_2_m_above_gnd',
+    'wind_speed_10_m_above_gnd',
+    'wind_direction_10_m_above_gnd',
+    'wind_gust_10_m_above_gnd'
+]
+
+def wind_columns_from_weather(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {
+        'temperature_2_m_above_gnd': columns['temperature_2_m_above_gnd'],
+        'relative_humidity_2_m_above_gnd': columns['relative_humidity_2_m_above_gnd'],
+        'dewpoint_2m': columns['dewpoint_2m'],
+        'wind_speed_10_m_above_gnd': columns['wind_speed_10_m_above_gnd'],
+        'windspeed_100m': columns['wind_speed_80_m_above_gnd'],
+        'wind_direction_10_m_above_gnd': columns['wind_direction_10_m_above_gnd'],
+        'winddirection_100m': columns['wind_direction_80_m_above_gnd'],
+        'wind_gust_10_m_above_gnd': columns['wind_gust_10_m_above_gnd'],
+    }
+
+@timed("predict.wind")
+def predict_power_wind_columns(columns: Dict[str, np.ndarray], timestamps: pd.DatetimeIndex) -> np.ndarray:
+    wind_model = get_wind_model()
+
+    features = pd.DataFrame({
+        'dewpoint_2m': columns['dewpoint_2m'],
+        'winddirection_100m': columns['winddirection_100m'],
+        'windspeed_100m': columns['windspeed_100m'],
+        'hour': timestamps.hour,
+        'day': timestamps.day,
+        'month': timestamps.month,
+        'year': timestamps.year,
+        'temperature_2_m_above_gnd': columns['temperature_2_m_above_gnd'],
+        'relative_humidity_2_m_above_gnd': columns['relative_humidity_2_m_above_gnd'],
+        'wind_speed_10_m_above_gnd': columns['wind_speed_10_m_above_gnd'],
+        'wind_direction_10_m_above_gnd': columns['wind_direction_10_m_above_gnd'],
+        'wind_gust_10_m_above_gnd': columns['wind_gust_10_m_above_gnd']
+    }, columns=WIND_FEATURES)
+    features_scaled = wind_model.scaler.transform(features)
+
+    return wind_model.model.predict(features_scaled)
+
+def predict_power_wind_batch(rows: List[WeatherData]) -> List[dict]:
+    if not rows:
+        return []
+
     try:
-        model_dict = load_model()
-        model = model_dict['model']
-        scaler = model_dict['scaler']
-
-        if data.timestamp:
-            dt = pd.to_datetime(data.timestamp)
-        else:
-            dt = datetime.datetime.now()
-            
-        hour = dt.hour
-        day = dt.day
-        month = dt.month
-        year = dt.year
-
-        features = pd.DataFrame([[
-            data.dewpoint_2m,                      
-            data.winddirection_100m,               
-            data.windspeed_100m,                   
-            hour,                                  
-            day,                                   
-            month,                                 
-            year,                                  
-            data.temperature_2_m_above_gnd,        
-            data.relative_humidity_2_m_above_gnd,  
-            data.wind_speed_10_m_above_gnd,      
-            data.wind_direction_10_m_above_gnd,  
-            data.wind_gust_10_m_above_gnd        
-        ]], columns=[
-            'dewpoint_2m',
-            'winddirection_100m',
-            'windspeed_100m',
-            'hour',
-            'day', 
-            'month',
-            'year',
-            'temperature_2_m_above_gnd',
-            'relative_humidity_2_m_above_gnd',
-            'wind_speed_10_m_above_gnd',
-            'wind_direction_10_m_above_gnd',
-            'wind_gust_10_m_above_gnd'
-        ])
-
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
-
-        return {
-            "predicted_power": float(prediction),
-            "timestamp": data.timestamp or dt.isoformat()
-        }
+        now = datetime.datetime.now()
+        timestamps = [pd.to_datetime(row.timestamp) if row.timestamp else now for row in rows]
+
+        predictions = predict_power_wind_columns(
+            {field: [getattr(row, field) for row in rows] for field in WIND_FEATURES if field in WeatherData.model_fields},
+            pd.DatetimeIndex([dt.replace(tzinfo=None) for dt in timestamps])
+        )
+
+        # No timestamp here: results are cached for the whole hour and shared
+        # between requests, so with_timestamp adds it per request.
+        return [{"predicted_power": float(prediction)} for prediction in predictions]
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def with_timestamp(row: WeatherData, result: dict, now: Optional[datetime.datetime] = None) -> dict:
+    return {**result, "timestamp": row.timestamp or (now or datetime.datetime.now()).isoformat()}
+
+def predict_power_wind(data: WeatherData):
+    return with_timestamp(data, predict_power_wind_batch([data])[0])
+
 if __name__ == "__main__":
-    import asyncio
-    
     data = WeatherData(
         temperature_2m=10.0,
         relativehumidity_2m=50.0,
@@ -100,11 +136,8 @@ if __name__ == "__main__":
         windgusts_10m=15.0
     )
     
-    async def main():
-        try:
-            result = await predict_power_wind(data)
-            print(result)
-        except Exception as e:
-            print(f"Error: {str(e)}")
-    
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        result = predict_power_wind(data)
+        print(result)
+    except Exception as e:
+        print(f"Error: {str(e)}")
\ No newline at end of file